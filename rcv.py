@@ -6,7 +6,28 @@
     Date Last Modified: 10/26/2021
     Extra Credit: random index of lowest value (find_index_of_min)
 '''
+import csv
+import hashlib
+import io
+import json
 import random
+import time
+from array import array
+from collections import Counter
+from dataclasses import dataclass, field
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+EXHAUSTED = 0           # id of an empty rank (None, "x" or "")
+UNKNOWN = 1             # id of a name that is not on the candidate list
+FIRST_CANDIDATE_ID = 2  # candidates[i] is stored as i + FIRST_CANDIDATE_ID
+BLANK_MARKS = (None, "x", "")
+BACKENDS = ("python", "numpy", "check")
+NUMPY_MIN_BALLOTS = 50000   # below this many rows the pure-Python tally is faster
+
 def declare_winner(name:str, num_votes_for:int, num_votes_total:int) -> None:
     '''
      Function that prints an election winner and the percent of the vote they earned
@@ -48,19 +69,35 @@ def count_the_votes(candidates:list, votes_list:list) -> list:
 
         Parameters:
         ------------
-        votes_liste: list -- list of votes
+        votes_list: list -- list of votes
         candidates: list -- list of candidates
 
         Returns:
         --------
         Returns list of amount of votes each candidate earned
         '''
-    new_list = [0]*(len(candidates))
-    for x in range(len(votes_list)):
-        index = find_candidate(votes_list[x], candidates)
-        if votes_list[x] == candidates[index]:
-            new_list[index]+=1
-    return new_list
+    return tally_votes(candidates, votes_list)[0]
+
+def tally_votes(candidates:list, votes_list:list) -> tuple:
+    '''
+     Function that counts every vote in a single pass over the ballots
+
+        Parameters:
+        ------------
+        candidates: list -- list of candidates
+        votes_list: list -- list of votes, blanks (None, "x") mark exhausted ballots
+
+        Returns:
+        --------
+        Returns (votes per candidate, number of exhausted votes, number of votes for names not in candidates)
+        '''
+    counted = Counter(votes_list)
+    counts = [counted.get(name, 0) for name in candidates]
+    exhausted = 0
+    for mark in BLANK_MARKS:
+        exhausted += counted.get(mark, 0)
+    unknown = len(votes_list) - sum(counts) - exhausted
+    return counts, exhausted, unknown
 
 def determine_winner_simple_majority(vote_counts) -> int:
     '''
@@ -74,48 +111,32 @@ def determine_winner_simple_majority(vote_counts) -> int:
         --------
         Returns index of candidate who has majority of the vote
         '''
-    total_votes = 0
     total_votes = sum(vote_counts)
     for i in range(len(vote_counts)):
-        if round(vote_counts[i]/total_votes,1) > 0.5:
+        if 2*vote_counts[i] > total_votes:
             return i
     return None
 
-def simple_majority_vote(vote_counts:list) -> int:
+def simple_majority_vote(vote_counts:list, choose = None) -> int:
     '''
      Function that determines the index of the winning candidate
 
         Parameters:
         ------------
-        candidates: list -- list of candidate names
-        choice_1: list -- list of integers with votes given to each candidate
+        vote_counts: list -- list of integers with votes given to each candidate
+        choose: function -- picks the winner by lot from a list of tied indexes; random if None
 
         Returns:
         --------
         Returns index of the winner. If nobody wins, None is returned
         '''
     if are_all_equal(vote_counts):
+        if choose is not None:
+            return choose(list(range(len(vote_counts))))
         random_number = random.randint(0, len(vote_counts)-1)
         return random_number
     return determine_winner_simple_majority(vote_counts)
 
-def sum(some_list:list) -> int:
-    '''
-     Function that returns the sum of all ints in list
-
-        Parameters:
-        ------------
-        some_list: list - list of ints
-
-        Returns:
-        --------
-        Returns sum (int) of everything in the list
-        '''
-    total = 0
-    for x in range(len(some_list)):
-        total += some_list[x]
-    return total
-
 def are_all_equal(vote_counts: list) -> bool:
     '''
      Function that detrmines whether all values in a list are equal
@@ -128,11 +149,7 @@ def are_all_equal(vote_counts: list) -> bool:
         --------
         Returns True if every index in the list contains the same value, otherwise it returns False
         '''
-    number = vote_counts[0]
-    for x in range(1, len(vote_counts)):
-        if vote_counts[x] != number:
-            return False
-    return True
+    return min(vote_counts) == max(vote_counts)
 
 
 def copy_list(some_list: list) -> list:
@@ -147,70 +164,178 @@ def copy_list(some_list: list) -> list:
         --------
         Returns the copy of the original parameter's list
         '''
-    new_list = [0]*len(some_list)
-    for x in range(len(some_list)):
-        new_list[x] = some_list[x]
-    return new_list
-def simple_rcv(candidates: list, first_choice:list, second_choice:list, third_choice:list, debug: bool = False) -> None:
+    return list(some_list)
+def simple_rcv(candidates: list, *choices: list, debug: bool = False, grouped: bool = False, tie_break = None, batch_elimination: bool = False,
+               metrics = None, backend: str = None):
     '''
-     Function that determines the winner, if there is one, for first round voting
+     Function that runs a ranked-choice election and declares the winner
 
         Parameters:
         ------------
         candidates: list - list of candidates
-        first_choice: list - list of first choices
-        second_choice: list- list of second choices
-        third_choice: list - list of third choices
-        debug: bool - boolean that, if true, calls print_slate
+        choices: list - first_choice, second_choice, ... lists, any number of ranks
+        debug: bool - boolean that, if true, calls print_slate every round; may also be
+                      passed by position after the choice lists, as in simple_rcv(c, f, s, t, True)
+        grouped: bool - boolean that, if true, tabulates identical rankings as weighted groups
+        tie_break: RandomTieBreak - tie-break policy, the global random module if None
+        batch_elimination: bool - boolean that, if true, drops every mathematically eliminated candidate at once
+        metrics: TabulationMetrics - collector of per-round timings and counters, nothing is measured if None
+        backend: str - "python", "numpy" or "check", see make_tally
 
         Returns:
         --------
-        None
+        RCVResult with every round of the count
+        '''
+    if choices and isinstance(choices[-1], bool):
+        # callers written against simple_rcv(candidates, first, second, third, debug)
+        *choices, debug = choices
+    store = build_ballot_store(candidates, *choices)
+    result = tabulate(store, grouped, tie_break=tie_break, batch_elimination=batch_elimination, metrics=metrics,
+                      backend=backend)
+    render_console(result, debug)
+    return result
+
+def tabulate(store, grouped: bool = False, tally = None, tie_break = None, exclude: list = (), batch_elimination: bool = False,
+             metrics = None, backend: str = None):
+    '''
+     Function that eliminates candidates round by round until one has a majority
+
+        Nothing is printed; pass the result to render_console, render_json or
+        render_csv to report it.
+
+        Parameters:
+        ------------
+        store: BallotStore - ballots with any number of ranks and candidates
+        grouped: bool - boolean that, if true, tabulates identical rankings as weighted groups
+        tally: IncrementalTally - vote counter to use, for example a sharded one; built from store if None
+        tie_break: RandomTieBreak - tie-break policy, the global random module if None
+        exclude: list - names of withdrawn candidates, skipped on every ballot from the start;
+                        a tally passed in must have been built with the same exclusions
+        batch_elimination: bool - boolean that, if true, eliminates in one round every group of trailing
+                                  candidates whose combined votes are below the next candidate's
+        metrics: TabulationMetrics - collector that receives each round's timings and counters through
+                                     record_round; the clock is never read if None
+        backend: str - vote counter built when tally is None: "python", "numpy", or "check" to run both
+                       and raise AssertionError on any difference; see make_tally
+
+        Returns:
+        --------
+        RCVResult with every round of the count
+        '''
+    for name in exclude:
+        if name not in store.ids:
+            raise ValueError(f"cannot exclude unknown candidate {name!r}")
+    excluded = [store.ids[name] for name in exclude]
+    continuing = [x for x in store.candidate_ids() if x not in excluded]
+    if not continuing:
+        raise ValueError("an election needs at least one candidate")
+    if tally is None:
+        if grouped:
+            store = group_ballots(store, keep_precincts=False)
+        tally = make_tally(store, excluded, backend)
+    if tie_break is None:
+        tie_break = RandomTieBreak()
+    history = []
+    result = RCVResult(list(store.candidates), store.num_ballots)
+
+    def choose_winner(tied: list) -> int:
+        return names.index(tie_break.break_tie([names[i] for i in tied], history, False))
+
+    def choose_eliminated(tied: list) -> int:
+        return names.index(tie_break.break_tie([names[i] for i in tied], history, True))
+
+    while True:
+        if metrics is not None:
+            started = time.perf_counter()
+        vote_count = tally.votes_for(continuing)
+        names = store.names_of(continuing)
+        history.append(dict(zip(names, vote_count)))
+        current = RoundResult(len(result.rounds) + 1, history[-1], tally.counts[EXHAUSTED], tally.counts[UNKNOWN])
+        result.rounds.append(current)
+        # with no votes for any continuing candidate (no ballots, or only blank ones) nobody is elected,
+        # rather than drawing a winner from an all-way tie at 0
+        voted = any(vote_count)
+        winner = simple_majority_vote(vote_count, choose_winner) if voted else None
+        if metrics is not None:
+            counted = time.perf_counter()
+        if winner != None or not voted:
+            if winner != None:
+                current.winner = names[winner]
+            if metrics is not None:
+                metrics.record_round(current, counted - started, 0.0, 0.0, 0)
+            return result
+
+        size = 1
+        if batch_elimination:
+            size = max(1, len(find_batch_elimination(vote_count)))
+        current.batch = size > 1
+        if metrics is not None:
+            selected = time.perf_counter()
+            touched = getattr(tally, "rows_touched", 0)
+        transfers = [0]*store.num_ids
+        out = []
+        for step in range(size):
+            if step:
+                # replay the rounds one-at-a-time elimination would have had, so that tie-break
+                # policies reading the history (or its length) decide exactly as they would there
+                remaining = [x for x in continuing if x not in out]
+                vote_count = tally.votes_for(remaining)
+                names = store.names_of(remaining)
+                history.append(dict(zip(names, vote_count)))
+            index = find_index_of_min(vote_count, choose_eliminated)
+            out.append(store.ids[names[index]])
+            current.eliminated.append(names[index])
+            moved = tally.eliminate(out[-1])
+            row = {store.name_of(x): moved[x] for x in range(FIRST_CANDIDATE_ID, len(moved)) if moved[x]}
+            row[None] = moved[EXHAUSTED] + moved[UNKNOWN]
+            current.candidate_transfers[names[index]] = row
+            for x in range(len(moved)):
+                transfers[x] += moved[x]
+        continuing = [x for x in continuing if x not in out]
+        for x in continuing:
+            if transfers[x]:
+                current.transfers[store.name_of(x)] = transfers[x]
+        current.exhausted_transfers = transfers[EXHAUSTED] + transfers[UNKNOWN]
+        if metrics is not None:
+            metrics.record_round(current, counted - started, selected - counted, time.perf_counter() - selected,
+                                 getattr(tally, "rows_touched", 0) - touched)
+
+def find_batch_elimination(vote_counts: list) -> list:
+    '''
+     Function that finds the trailing candidates who can no longer win
+
+        The largest group of lowest candidates whose combined votes are fewer
+        than the votes of the next candidate up can be eliminated together:
+        even if all their votes went to one of them, that one would still be
+        last, so one-at-a-time elimination would remove them all anyway.
+
+        Parameters:
+        ------------
+        vote_counts: list - list of integers with votes given to each candidate
+
+        Returns:
+        --------
+        Indexes of the candidates to eliminate, empty if fewer than two can go at once
         '''
-    round1_candidates = copy_list(candidates)
-    round1_top_choices = copy_list(first_choice)
-    if debug:
-        print_slate(round1_candidates, first_choice, second_choice, third_choice, 1)
-    round1_vote_count = count_the_votes(round1_candidates, round1_top_choices)
-    winner = simple_majority_vote(round1_vote_count)
-    if winner != None:
-        declare_winner(candidates[winner], round1_vote_count[winner], len(round1_top_choices))
-        return
-
-    lowest_index_1 = find_index_of_min(round1_vote_count)
-    declare_eliminated(round1_candidates[lowest_index_1], round1_vote_count[lowest_index_1], len(round1_top_choices))
-    round2_candidates = remove_candidate(round1_candidates, lowest_index_1)
-    round2_top_choices = reassign_votes(round1_top_choices, second_choice, third_choice, round1_candidates[lowest_index_1], round2_candidates)
-    if debug:
-        print_slate(round2_candidates, round2_top_choices, second_choice, third_choice, 2)
-    round2_vote_count = count_the_votes(round2_candidates, round2_top_choices)
-    winner_round_2 = simple_majority_vote(round2_vote_count)
-    if winner_round_2 != None:
-        declare_winner(round2_candidates[winner_round_2], round2_vote_count[winner_round_2], len(round2_top_choices))
-        return
-
-    lowest_index_2 = find_index_of_min(round2_vote_count)
-    declare_eliminated(round2_candidates[lowest_index_2], round2_vote_count[lowest_index_2], len(round2_top_choices))
-    round3_candidates = remove_candidate(round2_candidates, lowest_index_2)
-    round3_top_choices = reassign_votes(round2_top_choices, second_choice, third_choice, round2_candidates[lowest_index_2], round3_candidates)
-    if debug:
-        print_slate(round3_candidates, round3_top_choices, second_choice, third_choice, 3)
-    round3_vote_count = count_the_votes(round3_candidates, round3_top_choices)
-    winner_round_3 = simple_majority_vote(round3_vote_count)
-    if winner_round_3 != None:
-        declare_winner(round3_candidates[winner_round_3], round3_vote_count[winner_round_3], len(round3_top_choices))
-        return
-
-def print_slate(candidates: list, first_choice: list, second_choice: list, third_choice:list, round: int) -> None:
-    '''
-     Function that prints round number and candidates
+    order = sorted(range(len(vote_counts)), key=lambda i: vote_counts[i])
+    batch = []
+    total = 0
+    for k in range(len(order) - 1):
+        total += vote_counts[order[k]]
+        if total < vote_counts[order[k + 1]]:
+            batch = order[:k + 1]
+    if len(batch) < 2:
+        return []
+    return batch
+
+def print_slate(candidates: list, vote_counts: list, round: int) -> None:
+    '''
+     Function that prints round number, candidates and their votes
 
         Parameters:
         ------------
         candidates: list - list of candidates
-        first_choice: list - list of first choices
-        second_choice: list- list of second choices
-        third_choice: list - list of third choices
+        vote_counts: list - votes of each candidate this round
         round: int - current round
 
         Returns:
@@ -219,33 +344,27 @@ def print_slate(candidates: list, first_choice: list, second_choice: list, third
         '''
     print(f"----- ROUND {round}-----")
     print(f"Candidates {candidates}")
-    print(f"Choice 1 votes: {first_choice}")
-    print(f"Choice 2 votes: {second_choice}")
-    print(f"Choice 3 votes: {third_choice}")
+    print(f"Votes {vote_counts}")
 
-def find_index_of_min(some_list:list) -> int:
+def find_index_of_min(some_list:list, choose = None) -> int:
     '''
      Function that returns lowest index in voting list
 
         Parameters:
         ------------
         some_list: list - list of integers
+        choose: function - picks one of several tied lowest indexes; random if None
 
         Returns:
         --------
         Index where lowest value is located
         '''
-    multiple_instances = []
-    min_value = some_list[0]
-    index = 0
-    random_num = 0
-    for x in range(len(some_list)):
-        if some_list[x] < min_value:
-            min_value = some_list[x]
-            index = x
-    for x in range(len(some_list)):
-        if some_list[x] == min_value:
-            multiple_instances.append(x)
+    min_value = min(some_list)
+    multiple_instances = [x for x in range(len(some_list)) if some_list[x] == min_value]
+    if choose is not None:
+        if len(multiple_instances) == 1:
+            return multiple_instances[0]
+        return choose(multiple_instances)
     random_num = random.randint(0, len(multiple_instances)-1)
     return multiple_instances[random_num]
 def declare_eliminated(name:str, num_votes_for:int, num_votes_total:int) -> None:
@@ -277,12 +396,7 @@ def remove_candidate(candidates: list, index: int) -> list:
         --------
         Updated list of candidates with eliminated candidate gone
         '''
-    new_list = []
-    for x in range(0, index):
-        new_list.append(candidates[x])
-    for x in range(index+1, len(candidates)):
-        new_list.append(candidates[x])
-    return new_list
+    return candidates[:index] + candidates[index+1:]
 def reassign_votes(first_choice:list, second_choice:list, third_choice:list, eliminated:str, new_candidates:list) -> list:
     '''
      Function that reassigns votes from eliminated candidates
@@ -298,17 +412,776 @@ def reassign_votes(first_choice:list, second_choice:list, third_choice:list, eli
 
         Returns:
         --------
-        New list with votes transferred from the eliminated candidate
+        New list with votes transferred from the eliminated candidate; first_choice is left unchanged
         '''
     new_first_choice = []
     for x in range(len(first_choice)):
-        if first_choice[x] == eliminated:
-            first_choice[x] = second_choice[x]
-            if second_choice[x] == eliminated:
-                first_choice[x] = third_choice[x]
-                if third_choice[x] == eliminated:
-                    first_choice[x] = None
-    return first_choice
+        choice = first_choice[x]
+        if choice == eliminated:
+            choice = second_choice[x]
+            if choice == eliminated:
+                choice = third_choice[x]
+                if choice == eliminated:
+                    choice = None
+        new_first_choice.append(choice)
+    return new_first_choice
+
+class BallotStore:
+    '''
+     Class that holds ballots as compact integer rank columns
+
+        Candidate names are interned once into small integer ids so that
+        tabulation compares integers instead of strings. Empty ranks are
+        stored as EXHAUSTED and names missing from the candidate list as
+        UNKNOWN.
+
+        Attributes:
+        ------------
+        candidates: list -- candidate names, candidates[i] has id i + FIRST_CANDIDATE_ID
+        ids: dict -- maps each candidate name to its id
+        typecode: str -- array typecode of the columns ('B' or 'H')
+        columns: list -- one array per rank, columns[r][b] is the id ranked r-th on ballot b
+        weights: array -- number of voters behind each ballot row, None when every row is one voter
+        precincts: array -- precinct id of each ballot row, None when precincts are not tracked
+        precinct_names: list -- precinct names, precinct_names[p] has precinct id p
+        '''
+    def __init__(self, candidates: list, num_ranks: int) -> None:
+        self.candidates = list(candidates)
+        self.ids = {}
+        for i in range(len(self.candidates)):
+            name = self.candidates[i]
+            if name in BLANK_MARKS or name in self.ids:
+                raise ValueError(f"invalid or duplicate candidate name: {name!r}")
+            self.ids[name] = i + FIRST_CANDIDATE_ID
+        if self.num_ids <= 0x100:
+            self.typecode = 'B'
+        elif self.num_ids <= 0x10000:
+            self.typecode = 'H'
+        else:
+            raise ValueError(f"too many candidates: {len(self.candidates)}")
+        self.columns = [array(self.typecode) for x in range(num_ranks)]
+        self.weights = None
+        self.precincts = None
+        self.precinct_names = []
+        self.precinct_ids = {}
+
+    @property
+    def num_ids(self) -> int:
+        return len(self.candidates) + FIRST_CANDIDATE_ID
+
+    @property
+    def num_ranks(self) -> int:
+        return len(self.columns)
+
+    def __len__(self) -> int:
+        if not self.columns:
+            return 0
+        return len(self.columns[0])
+
+    @property
+    def num_ballots(self) -> int:
+        if self.weights is None:
+            return len(self)
+        return sum(self.weights)
+
+    def candidate_ids(self) -> list:
+        return list(range(FIRST_CANDIDATE_ID, self.num_ids))
+
+    def id_of(self, name: str) -> int:
+        '''
+         Function that interns a ballot entry into its integer id
+
+            Parameters:
+            ------------
+            name: str -- candidate name, or a blank mark from BLANK_MARKS
+
+            Returns:
+            --------
+            The candidate's id, EXHAUSTED for blanks or UNKNOWN for names not on the list
+            '''
+        if name in BLANK_MARKS:
+            return EXHAUSTED
+        return self.ids.get(name, UNKNOWN)
+
+    def name_of(self, candidate_id: int) -> str:
+        '''
+         Function that turns an id back into the name it was interned from
+
+            Parameters:
+            ------------
+            candidate_id: int -- id stored in a rank column
+
+            Returns:
+            --------
+            The candidate's name, None for EXHAUSTED or "?" for UNKNOWN
+            '''
+        if candidate_id == EXHAUSTED:
+            return None
+        if candidate_id == UNKNOWN:
+            return "?"
+        return self.candidates[candidate_id - FIRST_CANDIDATE_ID]
+
+    def names_of(self, ids) -> list:
+        return [self.name_of(x) for x in ids]
+
+    def precinct_id(self, precinct: str) -> int:
+        '''
+         Function that interns a precinct name, adding it the first time it is seen
+
+            Parameters:
+            ------------
+            precinct: str -- precinct name
+
+            Returns:
+            --------
+            The precinct's id
+            '''
+        if precinct not in self.precinct_ids:
+            self.precinct_ids[precinct] = len(self.precinct_names)
+            self.precinct_names.append(precinct)
+        return self.precinct_ids[precinct]
+
+    def add_ballot(self, ranking: list, weight: int = 1, precinct: str = None) -> None:
+        '''
+         Function that appends one ballot given as a list of names in rank order
+
+            Parameters:
+            ------------
+            ranking: list -- names from first to last choice, may be shorter than num_ranks
+            weight: int -- number of voters who cast this ranking, only kept by weighted stores
+            precinct: str -- precinct the ballot was cast in, only kept when precincts are tracked
+
+            Returns:
+            --------
+            None
+            '''
+        if len(ranking) > self.num_ranks:
+            raise ValueError(f"ballot has {len(ranking)} ranks, store holds {self.num_ranks}")
+        for r in range(self.num_ranks):
+            if r < len(ranking):
+                self.columns[r].append(self.id_of(ranking[r]))
+            else:
+                self.columns[r].append(EXHAUSTED)
+        if self.weights is not None:
+            self.weights.append(weight)
+        if self.precincts is not None:
+            self.precincts.append(self.precinct_id(precinct))
+
+    def read_only(self) -> "BallotStore":
+        '''
+         Function that shares this store's columns as read-only views
+
+            Returns:
+            --------
+            BallotStore over the same buffers that can be handed to many
+            tabulations at once; the original columns can no longer grow
+            while the views exist
+            '''
+        shared = BallotStore(self.candidates, 0)
+        shared.columns = [memoryview(column).toreadonly() for column in self.columns]
+        if self.weights is not None:
+            shared.weights = memoryview(self.weights).toreadonly()
+        if self.precincts is not None:
+            shared.precincts = memoryview(self.precincts).toreadonly()
+            shared.precinct_names = self.precinct_names
+            shared.precinct_ids = self.precinct_ids
+        return shared
+
+    def fingerprint(self) -> str:
+        '''
+         Function that hashes the candidates, rank columns and weights
+
+            Returns:
+            --------
+            Hex digest that changes whenever the ballots or candidate list change
+            '''
+        digest = hashlib.sha256(repr(self.candidates).encode())
+        for column in self.columns:
+            digest.update(b"|")
+            digest.update(memoryview(column).cast('B'))
+        if self.weights is not None:
+            digest.update(b"#")
+            digest.update(memoryview(self.weights).cast('B'))
+        return digest.hexdigest()
+
+def build_ballot_store(candidates: list, *choice_lists: list) -> BallotStore:
+    '''
+     Function that encodes name-based choice lists into a BallotStore
+
+        Parameters:
+        ------------
+        candidates: list -- list of candidate names
+        choice_lists: list -- first_choice, second_choice, ... as parallel lists of names
+
+        Returns:
+        --------
+        BallotStore with one integer column per choice list
+        '''
+    store = BallotStore(candidates, len(choice_lists))
+    for r in range(len(choice_lists)):
+        if len(choice_lists[r]) != len(choice_lists[0]):
+            raise ValueError("all choice lists must have the same length")
+        store.columns[r] = array(store.typecode, map(store.id_of, choice_lists[r]))
+    return store
+
+def group_ballots(store: BallotStore, keep_precincts: bool = True) -> BallotStore:
+    '''
+     Function that collapses identical rankings into weighted ballot groups
+
+        When the store tracks precincts and keep_precincts is true, rankings
+        are grouped per precinct so that the groups can still be filtered by
+        precinct; otherwise the precincts are dropped and every distinct
+        ranking is one group.
+
+        Parameters:
+        ------------
+        store: BallotStore -- ballots to group, weighted or not
+        keep_precincts: bool -- boolean that, if true, keeps the precinct of every group
+
+        Returns:
+        --------
+        BallotStore with one row per distinct ranking and its voter count in weights
+        '''
+    keep_precincts = keep_precincts and store.precincts is not None
+    keys = list(store.columns)
+    if keep_precincts:
+        keys.append(store.precincts)
+    if store.weights is None:
+        groups = Counter(zip(*keys))
+    else:
+        groups = Counter()
+        for ranking, weight in zip(zip(*keys), store.weights):
+            groups[ranking] += weight
+    grouped = BallotStore(store.candidates, store.num_ranks)
+    rankings = list(groups)
+    for r in range(store.num_ranks):
+        grouped.columns[r] = array(store.typecode, [ranking[r] for ranking in rankings])
+    grouped.weights = array('Q', [groups[ranking] for ranking in rankings])
+    if keep_precincts:
+        grouped.precincts = array('I', [ranking[-1] for ranking in rankings])
+        grouped.precinct_names = list(store.precinct_names)
+        grouped.precinct_ids = dict(store.precinct_ids)
+    return grouped
+
+class BallotView:
+    '''
+     Class that reads ballots through a per-ballot rank pointer
+
+        The rank columns are never written: eliminating a candidate only
+        flags it, and advance() moves a ballot's pointer past every flagged
+        candidate. A round therefore copies no ballot data, and any number
+        of views can share one read-only BallotStore.
+
+        Attributes:
+        ------------
+        store: BallotStore -- ballots being read
+        eliminated: bytearray -- eliminated[id] is 1 once the candidate is out
+        position: array -- rank each ballot currently points at
+        '''
+    def __init__(self, store: BallotStore) -> None:
+        self.store = store
+        self.eliminated = bytearray(store.num_ids)
+        self.position = array('B' if store.num_ranks < 0x100 else 'H', [0])*len(store)
+
+    def advance(self, ballot: int) -> int:
+        '''
+         Function that moves a ballot's pointer past candidates who are out
+
+            Parameters:
+            ------------
+            ballot: int -- index of the ballot
+
+            Returns:
+            --------
+            Id of the ballot's new current choice, EXHAUSTED if it has none left
+            '''
+        columns = self.store.columns
+        rank = self.position[ballot]
+        while rank < len(columns):
+            choice = columns[rank][ballot]
+            if not self.eliminated[choice]:
+                self.position[ballot] = rank
+                return choice
+            rank += 1
+        self.position[ballot] = rank
+        return EXHAUSTED
+
+class IncrementalTally:
+    '''
+     Class that carries vote counts from round to round
+
+        Every ballot sits in the bucket of its current choice. Eliminating a
+        candidate only walks that candidate's bucket and advances each
+        ballot's BallotView pointer to its next choice that is still in the
+        race, so a round costs O(transferred ballots) instead of a full
+        recount and never touches the rank columns.
+
+        Candidates in excluded (withdrawn before the count) are skipped on
+        every ballot from the first round.
+
+        Attributes:
+        ------------
+        store: BallotStore -- ballots being tabulated
+        view: BallotView -- current choice of every ballot
+        counts: list -- votes indexed by id, counts[EXHAUSTED] and counts[UNKNOWN] included
+        buckets: list -- ballot indexes grouped by current candidate id
+        rows_touched: int -- ballot rows moved by eliminations so far
+        '''
+    def __init__(self, store: BallotStore, excluded: list = ()) -> None:
+        self.store = store
+        self.view = BallotView(store)
+        self.counts = [0]*store.num_ids
+        self.rows_touched = 0
+        self.buckets = [array('L') for x in range(store.num_ids)]
+        if store.num_ranks == 0:
+            return
+        for x in excluded:
+            self.view.eliminated[x] = 1
+        weights = store.weights
+        for b, choice in enumerate(store.columns[0]):
+            if self.view.eliminated[choice]:
+                choice = self.view.advance(b)
+            self.counts[choice] += 1 if weights is None else weights[b]
+            if choice >= FIRST_CANDIDATE_ID:
+                self.buckets[choice].append(b)
+
+    def votes_for(self, candidate_ids: list) -> list:
+        return [self.counts[x] for x in candidate_ids]
+
+    def eliminate(self, candidate_id: int) -> list:
+        '''
+         Function that eliminates a candidate and transfers only their ballots
+
+            Parameters:
+            ------------
+            candidate_id: int -- id of the eliminated candidate
+
+            Returns:
+            --------
+            List indexed by id with the votes each id received from the transfer
+            '''
+        transfers = [0]*self.store.num_ids
+        self.view.eliminated[candidate_id] = 1
+        moved = self.buckets[candidate_id]
+        self.buckets[candidate_id] = array('L')
+        self.rows_touched += len(moved)
+        advance = self.view.advance
+        weights = self.store.weights
+        for b in moved:
+            choice = advance(b)
+            transfers[choice] += 1 if weights is None else weights[b]
+            if choice >= FIRST_CANDIDATE_ID:
+                self.buckets[choice].append(b)
+        for x in range(len(transfers)):
+            self.counts[x] += transfers[x]
+        self.counts[candidate_id] = 0
+        return transfers
+
+class NumpyTally:
+    '''
+     Class that carries vote counts from round to round with vectorized NumPy passes
+
+        Same members and results as IncrementalTally. Every ballot's current
+        choice is kept in one array, counts come from numpy.bincount, and an
+        elimination selects the eliminated candidate's ballots with a mask
+        and advances them all together, reading the rank columns in place.
+
+        Attributes:
+        ------------
+        store: BallotStore -- ballots being tabulated
+        counts: list -- votes indexed by id, counts[EXHAUSTED] and counts[UNKNOWN] included
+        current: ndarray -- id each ballot currently counts for
+        rows_touched: int -- ballot rows moved by eliminations so far
+        '''
+    def __init__(self, store: BallotStore, excluded: list = ()) -> None:
+        if numpy is None:
+            raise ImportError("NumPy is not installed")
+        self.store = store
+        self.columns = [numpy.asarray(memoryview(column)) for column in store.columns]
+        self.weights = None if store.weights is None else numpy.asarray(memoryview(store.weights))
+        self.eliminated = numpy.zeros(store.num_ids, dtype=bool)
+        self.position = numpy.zeros(len(store), dtype=numpy.int32)
+        self.rows_touched = 0
+        if store.num_ranks == 0:
+            self.current = numpy.zeros(0, dtype=numpy.int32)
+            self.counts = [0]*store.num_ids
+            return
+        self.current = self.columns[0].astype(numpy.int32)
+        for x in excluded:
+            self.eliminated[x] = True
+        self.advance(numpy.flatnonzero(self.eliminated[self.current]))
+        self.counts = self.count(self.current, self.weights)
+
+    def count(self, choices, weights) -> list:
+        counted = numpy.bincount(choices, weights, minlength=self.store.num_ids)
+        if weights is not None:
+            # bincount adds weights as floats, exact for any realistic number of voters
+            counted = numpy.rint(counted).astype(numpy.int64)
+        return counted.tolist()
+
+    def advance(self, rows) -> None:
+        '''
+         Function that moves ballots to their next choice until it is a candidate still in the race
+
+            Parameters:
+            ------------
+            rows: ndarray -- indexes of the ballots whose current choice is out
+
+            Returns:
+            --------
+            None
+            '''
+        while len(rows):
+            position = self.position[rows] + 1
+            self.position[rows] = position
+            choice = numpy.full(len(rows), EXHAUSTED, dtype=numpy.int32)
+            for r in range(int(position.min()), len(self.columns)):
+                at = position == r
+                choice[at] = self.columns[r][rows[at]]
+            self.current[rows] = choice
+            rows = rows[self.eliminated[choice]]
+
+    def votes_for(self, candidate_ids: list) -> list:
+        return [self.counts[x] for x in candidate_ids]
+
+    def eliminate(self, candidate_id: int) -> list:
+        '''
+         Function that eliminates a candidate and transfers only their ballots
+
+            Parameters:
+            ------------
+            candidate_id: int -- id of the eliminated candidate
+
+            Returns:
+            --------
+            List indexed by id with the votes each id received from the transfer
+            '''
+        self.eliminated[candidate_id] = True
+        moved = numpy.flatnonzero(self.current == candidate_id)
+        self.rows_touched += len(moved)
+        self.advance(moved)
+        transfers = self.count(self.current[moved], None if self.weights is None else self.weights[moved])
+        for x in range(len(transfers)):
+            self.counts[x] += transfers[x]
+        self.counts[candidate_id] = 0
+        return transfers
+
+class CrossCheckTally:
+    '''
+     Class that runs the pure-Python and NumPy tallies side by side and compares every step
+
+        Attributes:
+        ------------
+        store: BallotStore -- ballots being tabulated
+        counts: list -- votes indexed by id, from the pure-Python tally
+        '''
+    def __init__(self, store: BallotStore, excluded: list = ()) -> None:
+        self.store = store
+        self.python = IncrementalTally(store, excluded)
+        self.numpy = NumpyTally(store, excluded)
+        self.counts = self.python.counts
+        self.compare(self.python.counts, self.numpy.counts, "counting the first choices")
+
+    def compare(self, expected: list, found: list, step: str) -> None:
+        if expected != found:
+            raise AssertionError(f"the NumPy backend disagrees with the Python backend after {step}: {found} != {expected}")
+
+    @property
+    def rows_touched(self) -> int:
+        return self.python.rows_touched
+
+    def votes_for(self, candidate_ids: list) -> list:
+        return [self.counts[x] for x in candidate_ids]
+
+    def eliminate(self, candidate_id: int) -> list:
+        transfers = self.python.eliminate(candidate_id)
+        step = f"eliminating {self.store.name_of(candidate_id)!r}"
+        self.compare(transfers, self.numpy.eliminate(candidate_id), step)
+        self.compare(self.python.counts, self.numpy.counts, step)
+        return transfers
+
+def make_tally(store: BallotStore, excluded: list = (), backend: str = None):
+    '''
+     Function that builds the vote counter of a tabulation backend
+
+        Parameters:
+        ------------
+        store: BallotStore -- ballots to tabulate
+        excluded: list -- ids of withdrawn candidates
+        backend: str -- "python", "numpy", or "check" to run both and raise AssertionError
+                        on any difference; NumPy for large elections when installed if None
+
+        Returns:
+        --------
+        IncrementalTally, NumpyTally or CrossCheckTally
+        '''
+    if backend is None:
+        backend = "numpy" if numpy is not None and len(store) >= NUMPY_MIN_BALLOTS else "python"
+    if backend == "python":
+        return IncrementalTally(store, excluded)
+    if backend == "numpy":
+        return NumpyTally(store, excluded)
+    if backend == "check":
+        return CrossCheckTally(store, excluded)
+    raise ValueError(f"unknown backend {backend!r}, use one of {BACKENDS}")
+
+class RandomTieBreak:
+    '''
+     Class that breaks ties with the global random module, like the original program
+
+        Runs using it are not reproducible, so its key is None and
+        tabulate_memoized never caches them.
+
+        Attributes:
+        ------------
+        key: tuple -- identifies the policy for caching, None when not reproducible
+        '''
+    key = None
+
+    def break_tie(self, tied: list, history: list, losing: bool) -> str:
+        '''
+         Function that picks one candidate out of a tie
+
+            Parameters:
+            ------------
+            tied: list -- names of the tied candidates, in ballot order
+            history: list -- one dict of name -> votes per round so far, current round last
+            losing: bool -- True when choosing who is eliminated, False when choosing a winner by lot
+
+            Returns:
+            --------
+            Name of the chosen candidate
+            '''
+        return tied[random.randint(0, len(tied)-1)]
+
+class SeededTieBreak(RandomTieBreak):
+    '''
+     Class that draws lots from a seeded generator
+
+        Each draw is seeded from (seed, round, tied candidates), so the same
+        tie always gets the same answer no matter how many ties came before
+        it or which process resolves it.
+        '''
+    def __init__(self, seed: int) -> None:
+        self.seed = seed
+        self.key = ("seeded", seed)
+
+    def break_tie(self, tied: list, history: list, losing: bool) -> str:
+        draw = random.Random(f"{self.seed}:{len(history)}:{losing}:{tied}")
+        return tied[draw.randrange(len(tied))]
+
+class LotOrderTieBreak(RandomTieBreak):
+    '''
+     Class that resolves ties with an order drawn by lot before the count
+
+        Attributes:
+        ------------
+        order: list -- candidate names from the first to lose a tie to the last
+        '''
+    def __init__(self, order: list) -> None:
+        self.order = list(order)
+        self.positions = {}
+        for i in range(len(self.order)):
+            self.positions[self.order[i]] = i
+        self.key = ("lot", tuple(self.order))
+
+    def break_tie(self, tied: list, history: list, losing: bool) -> str:
+        for name in tied:
+            if name not in self.positions:
+                raise ValueError(f"candidate {name!r} is missing from the lot order")
+        if losing:
+            return min(tied, key=self.positions.get)
+        return max(tied, key=self.positions.get)
+
+class LookbackTieBreak(RandomTieBreak):
+    '''
+     Class that resolves ties by looking at earlier rounds
+
+        A tie for elimination goes against the candidate with the fewest votes
+        in the most recent earlier round that separates them (a tie for the win
+        goes to the one with the most); ties that no round separates go to the
+        fallback policy.
+
+        Attributes:
+        ------------
+        fallback: RandomTieBreak -- policy for ties the history cannot break
+        '''
+    def __init__(self, fallback: RandomTieBreak = None) -> None:
+        if fallback is None:
+            fallback = RandomTieBreak()
+        self.fallback = fallback
+        self.key = None
+        if fallback.key is not None:
+            self.key = ("lookback", fallback.key)
+
+    def break_tie(self, tied: list, history: list, losing: bool) -> str:
+        for counts in reversed(history[:-1]):
+            votes = [counts.get(name, 0) for name in tied]
+            target = min(votes) if losing else max(votes)
+            tied = [tied[i] for i in range(len(tied)) if votes[i] == target]
+            if len(tied) == 1:
+                return tied[0]
+        return self.fallback.break_tie(tied, history, losing)
+
+def tabulate_memoized(store: BallotStore, tie_break: RandomTieBreak, cache: dict, grouped: bool = False):
+    '''
+     Function that reuses an earlier tabulation of the same ballots under the same policy
+
+        Parameters:
+        ------------
+        store: BallotStore -- ballots to tabulate
+        tie_break: RandomTieBreak -- tie-break policy, cached only if its key is not None
+        cache: dict -- maps (ballot fingerprint, policy key) to the result
+        grouped: bool -- boolean that, if true, tabulates identical rankings as weighted groups
+
+        Returns:
+        --------
+        RCVResult of the tabulation
+        '''
+    if tie_break.key is None:
+        return tabulate(store, grouped=grouped, tie_break=tie_break)
+    key = (store.fingerprint(), tie_break.key)
+    if key not in cache:
+        cache[key] = tabulate(store, grouped=grouped, tie_break=tie_break)
+    return cache[key]
+
+@dataclass
+class RoundResult:
+    '''
+     Class that records one round of the count
+
+        Attributes:
+        ------------
+        round: int -- round number, starting at 1
+        tallies: dict -- votes of every candidate still in the race
+        exhausted: int -- ballots with no choice left
+        unknown: int -- ballots whose current choice is not on the candidate list
+        eliminated: list -- candidates eliminated at the end of the round
+        transfers: dict -- votes each remaining candidate received from the eliminated
+        exhausted_transfers: int -- votes of the eliminated that became exhausted
+        winner: str -- winner declared this round, None if the count goes on
+        batch: bool -- True when several candidates were eliminated together
+        candidate_transfers: dict -- eliminated name -> {receiving name or None for exhausted: votes},
+                                     what each elimination of the round moved on its own
+        '''
+    round: int
+    tallies: dict
+    exhausted: int = 0
+    unknown: int = 0
+    eliminated: list = field(default_factory=list)
+    transfers: dict = field(default_factory=dict)
+    exhausted_transfers: int = 0
+    winner: str = None
+    batch: bool = False
+    candidate_transfers: dict = field(default_factory=dict)
+
+@dataclass
+class RCVResult:
+    '''
+     Class that records a whole ranked-choice tabulation
+
+        Attributes:
+        ------------
+        candidates: list -- candidate names
+        num_ballots: int -- number of ballots counted
+        rounds: list -- one RoundResult per round
+        '''
+    candidates: list
+    num_ballots: int
+    rounds: list = field(default_factory=list)
+
+    @property
+    def winner(self) -> str:
+        if not self.rounds:
+            return None
+        return self.rounds[-1].winner
+
+    def transfer_matrix(self) -> dict:
+        '''
+         Function that collects where each eliminated candidate's votes went
+
+            In a batch round a candidate's row can name another candidate of
+            the same batch, whose own row then passes those votes on.
+
+            Returns:
+            --------
+            Dict of eliminated name -> {receiving name or None for exhausted: votes}
+            '''
+        matrix = {}
+        for current in self.rounds:
+            for name in current.eliminated:
+                matrix[name] = dict(current.candidate_transfers[name])
+        return matrix
+
+def render_console(result: RCVResult, debug: bool = False) -> None:
+    '''
+     Function that prints eliminations and the winner the way the original program did
+
+        Parameters:
+        ------------
+        result: RCVResult -- tabulation to print
+        debug: bool -- boolean that, if true, calls print_slate every round
+
+        Returns:
+        --------
+        None
+        '''
+    for current in result.rounds:
+        if debug:
+            print_slate(list(current.tallies), list(current.tallies.values()), current.round)
+        for name in current.eliminated:
+            declare_eliminated(name, current.tallies[name], result.num_ballots)
+        if current.winner is not None:
+            declare_winner(current.winner, current.tallies[current.winner], result.num_ballots)
+        elif not current.eliminated:
+            print("No candidate received any votes.")
+
+def render_json(result: RCVResult) -> str:
+    '''
+     Function that renders a tabulation as JSON
+
+        Parameters:
+        ------------
+        result: RCVResult -- tabulation to render
+
+        Returns:
+        --------
+        JSON text with the winner and every round
+        '''
+    rounds = []
+    for current in result.rounds:
+        rounds.append({"round": current.round, "tallies": current.tallies, "exhausted": current.exhausted,
+                       "unknown": current.unknown, "eliminated": current.eliminated, "transfers": current.transfers,
+                       "exhausted_transfers": current.exhausted_transfers, "winner": current.winner,
+                       "batch": current.batch})
+    return json.dumps({"candidates": result.candidates, "num_ballots": result.num_ballots,
+                       "winner": result.winner, "rounds": rounds})
+
+def render_csv(result: RCVResult) -> str:
+    '''
+     Function that renders a tabulation as CSV with one row per candidate per round
+
+        Parameters:
+        ------------
+        result: RCVResult -- tabulation to render
+
+        Returns:
+        --------
+        CSV text with columns round, candidate, votes, transferred, status
+        '''
+    text = io.StringIO()
+    writer = csv.writer(text)
+    writer.writerow(["round", "candidate", "votes", "transferred", "status"])
+    for current in result.rounds:
+        for name, votes in current.tallies.items():
+            status = "continuing"
+            if name in current.eliminated:
+                status = "eliminated"
+            elif name == current.winner:
+                status = "winner"
+            writer.writerow([current.round, name, votes, current.transfers.get(name, 0), status])
+        writer.writerow([current.round, "", current.exhausted + current.unknown, current.exhausted_transfers, "exhausted"])
+    return text.getvalue()
 
 def main():
     print("Test find_index_of_min: ")
@@ -394,6 +1267,88 @@ def main():
     print("Test reassign_votes: ")
     print(reassign_votes(["Jake", "Jake", "Jake"], ["Jake", "Jake", "Jake"],["Jake", "Jake", "Jake"], "Jake", value))
     print("Expected: [None, None, None]")
+    print("------------------------------------------")
+    print("Test reassign_votes leaves its input alone: ")
+    first_choice = ["Jake", "Josh", "Sam"]
+    reassign_votes(first_choice, ["Sam", "Sam", "Sam"], ["Josh", "Josh", "Josh"], "Jake", value)
+    print(first_choice)
+    print("Expected: ['Jake', 'Josh', 'Sam']")
+    print("------------------------------------------")
+    print("Test tally_votes: ")
+    print(tally_votes(["Jake", "Josh", "Sam"], ["Jake", "x", "Sam", None, "Jake", "Bob"]))
+    print("Expected: ([2, 0, 1], 2, 1)")
+    print("------------------------------------------")
+    print("Test count_the_votes: ")
+    print(count_the_votes(["Jake", "Josh", "Sam"], ["Josh", "x", "Sam", "Josh"]))
+    print("Expected: [0, 2, 1]")
+    print("------------------------------------------")
+    print("Test simple_rcv with five ranks: ")
+    names = ["A", "B", "C", "D"]
+    choices = [["A", "A", "A", "A", "A", "B", "B", "B", "B", "C", "C", "D"],
+               ["x", "x", "x", "x", "x", "x", "x", "x", "x", "D", "x", "C"],
+               ["x", "x", "x", "x", "x", "x", "x", "x", "x", "C", "x", "B"],
+               ["x", "x", "x", "x", "x", "x", "x", "x", "x", "D", "x", "x"],
+               ["x", "x", "x", "x", "x", "x", "x", "x", "x", "B", "x", "x"]]
+    print(f"Result: {simple_rcv(names, *choices).winner}")
+    print("Expected: B")
+    print("------------------------------------------")
+    print("Test simple_rcv with debug passed by position: ")
+    result = simple_rcv(["A", "B"], ["A", "A", "B"], ["B", "x", "A"], ["x", "x", "x"], True)
+    print(f"Result: {result.winner} with {len(result.candidates)} candidates and {len(result.rounds)} round")
+    print("Expected: A with 2 candidates and 1 round")
+    print("------------------------------------------")
+    print("Test SeededTieBreak: ")
+    names = ["A", "B", "C"]
+    choices = [["A", "B", "C", "A", "B", "C"]]
+    winners = [simple_rcv(names, *choices, tie_break=SeededTieBreak(7)).winner for x in range(3)]
+    print(f"Result: {winners[0] == winners[1] == winners[2]}")
+    print("Expected: True")
+    print("------------------------------------------")
+    print("Test LotOrderTieBreak: ")
+    choices = [["A", "A", "B", "B", "C", "C", "C"], ["B", "B", "A", "A", "x", "x", "x"]]
+    print(f"Result: {simple_rcv(names, *choices, tie_break=LotOrderTieBreak(['B', 'A', 'C'])).winner}")
+    print("Expected: A")
+    print("------------------------------------------")
+    print("Test render_json: ")
+    result = tabulate(build_ballot_store(names, *choices), tie_break=LotOrderTieBreak(['B', 'A', 'C']))
+    print(json.loads(render_json(result))["rounds"][0]["transfers"])
+    print("Expected: {'A': 2}")
+    print("------------------------------------------")
+    print("Test tabulate without any votes: ")
+    print(f"Result: {tabulate(BallotStore(['X', 'Y'], 2)).winner} {tabulate(build_ballot_store(['X', 'Y'], ['x', 'zz'])).winner}")
+    print("Expected: None None")
+    simple_rcv(["X", "Y"], [], [])
+    print("Expected: No candidate received any votes.")
+    print("------------------------------------------")
+    print("Test tabulate grouped against per ballot: ")
+    store = build_ballot_store(["A", "B", "C", "D"], ["A", "B", "C", "D", "A", "C", "D", "B", "C", "x", "D"],
+                               ["B", "A", "D", "C", "x", "B", "A", "C", "D", "A", "zz"], ["C", "x", "A", "B", "x", "A", "x", "A", "B", "x", "B"])
+    per_ballot = tabulate(store, tie_break=LotOrderTieBreak(["D", "C", "B", "A"]))
+    grouped = tabulate(store, True, tie_break=LotOrderTieBreak(["D", "C", "B", "A"]))
+    print(f"Result: {grouped.rounds == per_ballot.rounds} {grouped == per_ballot} in {len(grouped.rounds)} rounds")
+    print(f"Expected: True True in {len(per_ballot.rounds)} rounds")
+    print("------------------------------------------")
+    print("Test find_batch_elimination: ")
+    print(sorted(find_batch_elimination([10, 1, 2, 9, 4])))
+    print("Expected: [1, 2, 4]")
+    print("------------------------------------------")
+    print("Test transfer_matrix with batch elimination: ")
+    store = build_ballot_store(["A", "B", "C", "D"], ["A"]*5 + ["B"]*5 + ["C", "D", "C", "D"], ["x"]*10 + ["A", "B", "x", "C"])
+    print(tabulate(store, tie_break=LotOrderTieBreak(["A", "B", "C", "D"]), batch_elimination=True).transfer_matrix())
+    print("Expected: {'C': {'A': 1, None: 1}, 'D': {'B': 1, None: 1}}")
+    print("------------------------------------------")
+    print("Test batch elimination with a lookback tie-break: ")
+    names = ["c0", "c1", "c2", "c3", "c4"]
+    store = build_ballot_store(names, ["c0", "c2", "c1", "c4", "c2", "c1", "c1", "c2"], ["c1", "c2", "x", "c2", "c0", "x", "x", "c0"])
+    print(tabulate(store, tie_break=LookbackTieBreak(LotOrderTieBreak(names)), batch_elimination=True).winner)
+    print("Expected:", tabulate(store, tie_break=LookbackTieBreak(LotOrderTieBreak(names))).winner)
+    print("------------------------------------------")
+    if numpy is not None:
+        print("Test backend check: ")
+        store = build_ballot_store(["A", "B", "C"], ["A", "B", "C", "B", "x"], ["B", "C", "A", "A", "C"])
+        print(tabulate(store, tie_break=SeededTieBreak(0), backend="check").winner)
+        print("Expected: the same winner as", tabulate(store, tie_break=SeededTieBreak(0), backend="python").winner)
+        print("------------------------------------------")
     simple_rcv(["a", "b", "c"], ["a", "c", "c", "c"], ["c", "c", "c", "c"], ["c", "c", "c", "c"])
 def main_rcv_testing():
 
@@ -533,5 +1488,6 @@ def main_rcv_testing():
     simple_rcv(candidates, choice1, choice2, choice3, debug = True)  # use after debugging added
     print("\t Expected: Candidate C or B wins 3rd round w/ 50.00%")
 
-main_rcv_testing()# UNCOMMENT THIS TO USE YOUR TESTS IN YOUR main
+if __name__ == "__main__":
+    main_rcv_testing()# UNCOMMENT THIS TO USE YOUR TESTS IN YOUR main
 # main_rcv_testing()   # UNCOMMENT THIS TO USE THE PROVIDED TESTS FOR simple_rcv
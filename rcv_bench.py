@@ -0,0 +1,275 @@
+'''
+    Purpose: Benchmark the tabulation hot paths of rcv.py on synthetic
+    elections (1K to 50M ballots, 2 to 50 candidates, 1 to 10 ranks) and
+    compare the numbers against a saved baseline so that every change to
+    the engine has measurements behind it
+
+    Example:
+        python rcv_bench.py --ballots 1000 1000000 --candidates 5 20 --ranks 3 10 --save baseline.json
+        python rcv_bench.py --ballots 1000 1000000 --candidates 5 20 --ranks 3 10 --compare baseline.json
+'''
+import argparse
+import contextlib
+import io
+import json
+import random
+import sys
+import time
+import tracemalloc
+from array import array
+from rcv import (EXHAUSTED, FIRST_CANDIDATE_ID, BallotStore, SeededTieBreak, count_the_votes,
+                 find_index_of_min, group_ballots, numpy, reassign_votes, simple_rcv, tabulate)
+
+DISTRIBUTIONS = ("uniform", "zipf", "polarized")
+LEGACY_LIMIT = 1000000   # the name-list benchmarks need Python objects per ballot
+CHUNK_SIZE = 1 << 20
+
+def candidate_popularity(num_candidates: int, distribution: str) -> list:
+    '''
+     Function that gives every candidate a relative popularity
+
+        Parameters:
+        ------------
+        num_candidates: int -- number of candidates
+        distribution: str -- "uniform", "zipf" (1/k popularity) or "polarized" (two strong blocs)
+
+        Returns:
+        --------
+        List of positive weights, one per candidate
+        '''
+    if distribution == "uniform":
+        return [1.0]*num_candidates
+    if distribution == "zipf":
+        return [1.0/(k + 1) for k in range(num_candidates)]
+    if distribution == "polarized":
+        return [10.0 if k < 2 else 1.0 for k in range(num_candidates)]
+    raise ValueError(f"unknown distribution {distribution!r}, use one of {DISTRIBUTIONS}")
+
+def generate_rankings(num_candidates: int, num_ranks: int, distribution: str, rng: random.Random, distinct: int) -> list:
+    '''
+     Function that draws a pool of distinct ranking patterns
+
+        Each pattern ranks between 1 and num_ranks candidates without
+        repeats, drawn by popularity; ballots are later sampled from it.
+
+        Parameters:
+        ------------
+        num_candidates: int -- number of candidates
+        num_ranks: int -- rank depth of the ballot
+        distribution: str -- candidate popularity, see candidate_popularity
+        rng: Random -- random generator
+        distinct: int -- number of patterns to draw
+
+        Returns:
+        --------
+        List of id tuples, each num_ranks long and padded with EXHAUSTED
+        '''
+    popularity = candidate_popularity(num_candidates, distribution)
+    rankings = []
+    for x in range(distinct):
+        remaining = list(range(num_candidates))
+        weights = list(popularity)
+        length = rng.randint(1, min(num_ranks, num_candidates))
+        ranking = []
+        for r in range(length):
+            pick = rng.choices(range(len(remaining)), weights)[0]
+            ranking.append(remaining.pop(pick) + FIRST_CANDIDATE_ID)
+            weights.pop(pick)
+        rankings.append(tuple(ranking) + (EXHAUSTED,)*(num_ranks - length))
+    return rankings
+
+def generate_election(num_ballots: int, num_candidates: int, num_ranks: int, distribution: str = "zipf",
+                      seed: int = 0, distinct: int = 4096) -> BallotStore:
+    '''
+     Function that builds a synthetic election directly into a BallotStore
+
+        Parameters:
+        ------------
+        num_ballots: int -- number of ballots
+        num_candidates: int -- number of candidates
+        num_ranks: int -- rank depth of the ballot
+        distribution: str -- candidate popularity, see candidate_popularity
+        seed: int -- seed of the generator, the same arguments always give the same election
+        distinct: int -- number of distinct ranking patterns the ballots are drawn from
+
+        Returns:
+        --------
+        BallotStore holding num_ballots ballots
+        '''
+    rng = random.Random(seed)
+    candidates = [f"C{k:02d}" for k in range(num_candidates)]
+    store = BallotStore(candidates, num_ranks)
+    rankings = generate_rankings(num_candidates, num_ranks, distribution, rng, distinct)
+    # a few patterns are much more common than the rest, like real elections
+    pattern_weights = [1.0/(k + 1) for k in range(len(rankings))]
+    generated = 0
+    while generated < num_ballots:
+        size = min(CHUNK_SIZE, num_ballots - generated)
+        chunk = rng.choices(rankings, pattern_weights, k=size)
+        for r in range(num_ranks):
+            store.columns[r].extend(array(store.typecode, [ranking[r] for ranking in chunk]))
+        generated += size
+    return store
+
+def time_call(function, repeat: int) -> float:
+    '''
+     Function that times the fastest of several calls
+
+        Parameters:
+        ------------
+        function: function -- call to time, takes no arguments
+        repeat: int -- number of calls
+
+        Returns:
+        --------
+        Shortest wall time in seconds
+        '''
+    best = None
+    for x in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            function()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+def peak_memory(function) -> int:
+    '''
+     Function that measures the peak Python allocation of one call
+
+        Parameters:
+        ------------
+        function: function -- call to measure, takes no arguments
+
+        Returns:
+        --------
+        Peak bytes allocated during the call, as seen by tracemalloc
+        '''
+    tracemalloc.start()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def benchmark_cases(store: BallotStore) -> dict:
+    '''
+     Function that lists the calls to benchmark for one election
+
+        The legacy name-list functions only run on the first LEGACY_LIMIT
+        ballots, since they need one Python object per ballot and rank.
+
+        Parameters:
+        ------------
+        store: BallotStore -- election to benchmark
+
+        Returns:
+        --------
+        Dict of benchmark name -> (number of ballots handled, function taking no arguments)
+        '''
+    cases = {}
+    tie_break = SeededTieBreak(0)
+    cases["tabulate"] = (len(store), lambda: tabulate(store, tie_break=tie_break, backend="python"))
+    if numpy is not None:
+        cases["tabulate_numpy"] = (len(store), lambda: tabulate(store, tie_break=tie_break, backend="numpy"))
+    cases["tabulate_grouped"] = (len(store), lambda: tabulate(store, grouped=True, tie_break=tie_break))
+    cases["group_ballots"] = (len(store), lambda: group_ballots(store))
+    legacy = min(len(store), LEGACY_LIMIT)
+    names = [store.names_of(column[:legacy]) for column in store.columns[:3]]
+    while len(names) < 3:
+        names.append([None]*legacy)
+    names = [["x" if name is None else name for name in column] for column in names]
+    eliminated = store.candidates[-1]
+    remaining = store.candidates[:-1]
+    cases["count_the_votes"] = (legacy, lambda: count_the_votes(store.candidates, names[0]))
+    cases["reassign_votes"] = (legacy, lambda: reassign_votes(names[0], names[1], names[2], eliminated, remaining))
+    counts = count_the_votes(store.candidates, names[0])
+    cases["find_index_of_min"] = (1, lambda: find_index_of_min(counts, lambda tied: tied[0]))
+    cases["simple_rcv"] = (legacy, lambda: simple_rcv(store.candidates, *names, tie_break=tie_break))
+    return cases
+
+def run_benchmarks(ballots: list, candidates: list, ranks: list, distribution: str, repeat: int, memory: bool) -> dict:
+    '''
+     Function that benchmarks every combination of election sizes
+
+        Parameters:
+        ------------
+        ballots: list -- ballot counts to generate
+        candidates: list -- candidate counts to generate
+        ranks: list -- rank depths to generate
+        distribution: str -- candidate popularity, see candidate_popularity
+        repeat: int -- calls per benchmark, the fastest one is kept
+        memory: bool -- boolean that, if true, also records peak memory (one extra call each)
+
+        Returns:
+        --------
+        Dict of "ballots/candidates/ranks/distribution" -> benchmark name ->
+        {"seconds", "ballots_per_sec" and, with memory, "peak_bytes"}
+        '''
+    results = {}
+    for num_ballots in ballots:
+        for num_candidates in candidates:
+            for num_ranks in ranks:
+                key = f"{num_ballots}/{num_candidates}/{num_ranks}/{distribution}"
+                store = generate_election(num_ballots, num_candidates, num_ranks, distribution)
+                results[key] = {}
+                for name, (handled, function) in benchmark_cases(store).items():
+                    seconds = time_call(function, repeat)
+                    measured = {"seconds": seconds, "ballots_per_sec": handled/seconds if seconds else float("inf")}
+                    if memory:
+                        measured["peak_bytes"] = peak_memory(function)
+                    results[key][name] = measured
+                    print(f"{key:<28} {name:<18} {seconds*1000:>10.2f} ms {measured['ballots_per_sec']:>14,.0f} ballots/s"
+                          + (f" {measured['peak_bytes']/2**20:>9.1f} MiB" if memory else ""))
+    return results
+
+def compare_to_baseline(results: dict, baseline: dict, tolerance: float) -> list:
+    '''
+     Function that finds benchmarks that got slower than the baseline
+
+        Parameters:
+        ------------
+        results: dict -- output of run_benchmarks
+        baseline: dict -- earlier output of run_benchmarks
+        tolerance: float -- allowed slowdown, 0.1 means 10% slower is still fine
+
+        Returns:
+        --------
+        List of (case, benchmark, baseline seconds, new seconds) for every regression
+        '''
+    regressions = []
+    for key, benchmarks in results.items():
+        for name, measured in benchmarks.items():
+            before = baseline.get(key, {}).get(name)
+            if before is not None and measured["seconds"] > before["seconds"]*(1 + tolerance):
+                regressions.append((key, name, before["seconds"], measured["seconds"]))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the rcv tabulation hot paths")
+    parser.add_argument("--ballots", type=int, nargs="+", default=[1000, 100000])
+    parser.add_argument("--candidates", type=int, nargs="+", default=[5, 20])
+    parser.add_argument("--ranks", type=int, nargs="+", default=[3, 10])
+    parser.add_argument("--distribution", choices=DISTRIBUTIONS, default="zipf")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--memory", action="store_true", help="also record peak memory with tracemalloc")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed slowdown before a regression is reported")
+    args = parser.parse_args()
+    results = run_benchmarks(args.ballots, args.candidates, args.ranks, args.distribution, args.repeat, args.memory)
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump(results, file, indent=2)
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare_to_baseline(results, json.load(file), args.tolerance)
+        for key, name, before, after in regressions:
+            print(f"REGRESSION {key} {name}: {before*1000:.2f} ms -> {after*1000:.2f} ms")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+'''
+    Purpose: Build the pairwise (head-to-head) preference matrix of an
+    election from the same rank columns rcv.tabulate counts, and report
+    the Condorcet winner, Condorcet loser and Smith set for audits. The
+    matrix is built from weighted ballot groups in one pass, vectorized
+    with NumPy when it is installed and in plain Python otherwise
+'''
+from rcv import FIRST_CANDIDATE_ID, BallotStore, group_ballots
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+CHUNK_CELLS = 1 << 24   # rows*candidates*candidates compared per NumPy chunk
+
+def ranked_candidates(ranking: tuple) -> list:
+    '''
+     Function that lists the candidates a ballot ranks, best first
+
+        Blanks, unknown names and repeated rankings of a candidate are
+        ignored; every ranked candidate is preferred over every unranked one.
+
+        Parameters:
+        ------------
+        ranking: tuple -- ids in rank order
+
+        Returns:
+        --------
+        List of candidate indexes (id - FIRST_CANDIDATE_ID) without repeats
+        '''
+    ranked = []
+    for choice in ranking:
+        index = choice - FIRST_CANDIDATE_ID
+        if index >= 0 and index not in ranked:
+            ranked.append(index)
+    return ranked
+
+def pairwise_matrix_python(store: BallotStore) -> list:
+    '''
+     Function that builds the preference matrix with plain Python loops
+
+        Each group credits its ranked candidates with a win over everyone
+        and then takes back the wins over candidates ranked above them,
+        so a group costs O(ranks^2) instead of O(candidates^2).
+
+        Parameters:
+        ------------
+        store: BallotStore -- weighted ballot groups
+
+        Returns:
+        --------
+        matrix[i][j]: voters who prefer candidates[i] over candidates[j]
+        '''
+    n = len(store.candidates)
+    beats_all = [0]*n
+    matrix = [[0]*n for x in range(n)]
+    for ranking, weight in zip(zip(*store.columns), store.weights):
+        ranked = ranked_candidates(ranking)
+        for i in range(len(ranked)):
+            row = matrix[ranked[i]]
+            beats_all[ranked[i]] += weight
+            for j in range(i):
+                row[ranked[j]] -= weight
+    for i in range(n):
+        for j in range(n):
+            if i != j:
+                matrix[i][j] += beats_all[i]
+    return matrix
+
+def pairwise_matrix_numpy(store: BallotStore) -> list:
+    '''
+     Function that builds the preference matrix with vectorized NumPy passes
+
+        Parameters:
+        ------------
+        store: BallotStore -- weighted ballot groups
+
+        Returns:
+        --------
+        matrix[i][j]: voters who prefer candidates[i] over candidates[j]
+        '''
+    n = len(store.candidates)
+    rows = len(store)
+    unranked = store.num_ranks
+    weights = numpy.asarray(store.weights).astype(numpy.int64)
+    # position[b, c] is the first rank of candidate c on ballot b, num_ranks if unranked
+    position = numpy.full((rows, n), unranked, dtype=numpy.int16)
+    every_row = numpy.arange(rows)
+    for r in reversed(range(store.num_ranks)):
+        column = numpy.asarray(store.columns[r]).astype(numpy.int64) - FIRST_CANDIDATE_ID
+        valid = column >= 0
+        position[every_row[valid], column[valid]] = r
+    matrix = numpy.zeros((n, n), dtype=numpy.int64)
+    step = max(1, CHUNK_CELLS//max(1, n*n))
+    for start in range(0, rows, step):
+        chunk = position[start:start + step]
+        prefers = chunk[:, :, None] < chunk[:, None, :]
+        matrix += numpy.tensordot(weights[start:start + step], prefers, axes=1)
+    return matrix.tolist()
+
+def pairwise_matrix(store: BallotStore, use_numpy: bool = None) -> list:
+    '''
+     Function that builds the candidates x candidates preference matrix
+
+        Parameters:
+        ------------
+        store: BallotStore -- ballots, grouped first if they are not weighted yet
+        use_numpy: bool -- force (True) or avoid (False) NumPy, use it when installed if None
+
+        Returns:
+        --------
+        matrix[i][j]: voters who prefer candidates[i] over candidates[j]
+        '''
+    if store.weights is None:
+        store = group_ballots(store, keep_precincts=False)
+    if use_numpy is None:
+        use_numpy = numpy is not None
+    if use_numpy:
+        if numpy is None:
+            raise ImportError("NumPy is not installed")
+        return pairwise_matrix_numpy(store)
+    return pairwise_matrix_python(store)
+
+def condorcet_winner(matrix: list) -> int:
+    '''
+     Function that finds the candidate who beats every other head to head
+
+        Parameters:
+        ------------
+        matrix: list -- pairwise preference matrix
+
+        Returns:
+        --------
+        Index of the Condorcet winner, None if there is none
+        '''
+    for i in range(len(matrix)):
+        if all(matrix[i][j] > matrix[j][i] for j in range(len(matrix)) if j != i):
+            return i
+    return None
+
+def condorcet_loser(matrix: list) -> int:
+    '''
+     Function that finds the candidate who loses to every other head to head
+
+        Parameters:
+        ------------
+        matrix: list -- pairwise preference matrix
+
+        Returns:
+        --------
+        Index of the Condorcet loser, None if there is none
+        '''
+    for i in range(len(matrix)):
+        if all(matrix[i][j] < matrix[j][i] for j in range(len(matrix)) if j != i):
+            return i
+    return None
+
+def smith_set(matrix: list) -> list:
+    '''
+     Function that finds the smallest set of candidates who each beat everyone outside it
+
+        A candidate is in the Smith set exactly when it reaches every other
+        candidate through a chain of head-to-head wins or ties.
+
+        Parameters:
+        ------------
+        matrix: list -- pairwise preference matrix
+
+        Returns:
+        --------
+        Sorted list of candidate indexes
+        '''
+    n = len(matrix)
+    reaches = [[i == j or matrix[i][j] >= matrix[j][i] for j in range(n)] for i in range(n)]
+    for k in range(n):
+        for i in range(n):
+            if reaches[i][k]:
+                for j in range(n):
+                    if reaches[k][j]:
+                        reaches[i][j] = True
+    return [i for i in range(n) if all(reaches[i])]
+
+def condorcet_report(store: BallotStore, use_numpy: bool = None) -> dict:
+    '''
+     Function that summarizes the head-to-head results of an election
+
+        Parameters:
+        ------------
+        store: BallotStore -- ballots of the election
+        use_numpy: bool -- force (True) or avoid (False) NumPy, use it when installed if None
+
+        Returns:
+        --------
+        Dict with the candidates, the pairwise "matrix", the Condorcet "winner"
+        and "loser" (names or None) and the "smith_set" (names)
+        '''
+    matrix = pairwise_matrix(store, use_numpy)
+    names = store.candidates
+    winner = condorcet_winner(matrix)
+    loser = condorcet_loser(matrix)
+    return {"candidates": list(names), "matrix": matrix,
+            "winner": None if winner is None else names[winner],
+            "loser": None if loser is None else names[loser],
+            "smith_set": [names[i] for i in smith_set(matrix)]}
+
+def main():
+    print("Test condorcet_report with a three-way cycle and a last-place candidate: ")
+    store = BallotStore(["A", "B", "C", "D"], 4)
+    for ranking in [["A", "B", "C", "D"], ["B", "C", "A", "D"], ["C", "A", "B", "D"]]:
+        store.add_ballot(ranking)
+    report = condorcet_report(store, use_numpy=False)
+    print("Expected: smith set ['A', 'B', 'C'], winner None, loser D")
+    print(f"Result: smith set {report['smith_set']}, winner {report['winner']}, loser {report['loser']}")
+    print("--------------------")
+    print("Test condorcet_report with a Condorcet winner: ")
+    store = BallotStore(["A", "B", "C"], 3)
+    for ranking in [["A", "B", "C"], ["A", "B", "C"], ["B", "C", "A"]]:
+        store.add_ballot(ranking)
+    report = condorcet_report(store, use_numpy=False)
+    print("Expected: smith set ['A'], winner A, loser C")
+    print(f"Result: smith set {report['smith_set']}, winner {report['winner']}, loser {report['loser']}")
+    print("--------------------")
+    if numpy is not None:
+        print("Test pairwise_matrix with and without NumPy: ")
+        store = BallotStore(["A", "B", "C", "D"], 3)
+        for ranking in [["A", "B", "C"], ["B", None, "D"], ["C", "C", "A"], ["D", "zz", "B"], [None, "A", None]]:
+            store.add_ballot(ranking)
+        print("Expected: True")
+        print(f"Result: {pairwise_matrix(store, use_numpy=False) == pairwise_matrix(store, use_numpy=True)}")
+        print("--------------------")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+'''
+    Purpose: Tabulate every ranked-choice contest of a CVR export in one
+    batch. The file is read once; each rank column is interned against the
+    candidate list of the contest it belongs to, and every contest's
+    BallotStore only keeps the ballots that voted in that contest. The
+    contests then run concurrently on a process pool, largest first, so
+    the batch takes about as long as the largest contest rather than the
+    sum of all of them
+
+    Example:
+        python rcv_contests.py cvr.csv contests.json --workers 8
+    where contests.json maps each contest name to its "candidates" and "rank_columns"
+'''
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+from array import array
+from dataclasses import dataclass
+from itertools import compress
+from rcv import BallotStore, UNKNOWN, render_json, tabulate
+from rcv_cvr import CHUNK_SIZE, chunked, read_csv_rankings
+
+@dataclass(frozen=True)
+class Contest:
+    '''
+     Class that describes one contest of a multi-contest CVR
+
+        Attributes:
+        ------------
+        name: str -- contest name, used as its key in the report
+        candidates: tuple -- names on the ballot for this contest
+        rank_columns: tuple -- CSV header names of the contest's rank columns, in rank order
+        '''
+    name: str
+    candidates: tuple
+    rank_columns: tuple
+
+def load_contests(path: str, contests: list, precinct_column: str = None, strict: bool = False,
+                  chunk_size: int = CHUNK_SIZE, undervotes: dict = None) -> dict:
+    '''
+     Function that reads a multi-contest CVR file once into one BallotStore per contest
+
+        Ballots that leave every rank of a contest blank did not vote in it:
+        they are left out of its store and only counted in undervotes.
+
+        Parameters:
+        ------------
+        path: str -- CSV file with a header row
+        contests: list -- Contest objects; a column can only belong to one contest
+        precinct_column: str -- header name of the precinct column, not tracked if None
+        strict: bool -- boolean that, if true, raises on names not on a contest's candidate list
+        chunk_size: int -- ballots interned per batch
+        undervotes: dict -- filled with contest name -> number of ballots that left it blank, if given
+
+        Returns:
+        --------
+        Dict of contest name -> BallotStore
+        '''
+    stores = {}
+    owners = []
+    columns = []
+    for contest in contests:
+        if contest.name in stores:
+            raise ValueError(f"duplicate contest {contest.name!r}")
+        store = BallotStore(contest.candidates, len(contest.rank_columns))
+        stores[contest.name] = store
+        positions = []
+        for name in contest.rank_columns:
+            if name in columns:
+                raise ValueError(f"column {name!r} belongs to more than one contest")
+            positions.append(len(columns))
+            columns.append(name)
+        owners.append((contest.name, store, positions))
+    if undervotes is not None:
+        undervotes.update(dict.fromkeys(stores, 0))
+    if not columns:
+        return stores
+    # every contest refers to the same precinct names, each with its own precinct column
+    interner = owners[0][1]
+    if precinct_column is not None:
+        for store in stores.values():
+            store.precincts = array('I')
+            store.precinct_names = interner.precinct_names
+            store.precinct_ids = interner.precinct_ids
+    for chunk in chunked(read_csv_rankings(path, columns, precinct_column), chunk_size):
+        by_column = list(zip(*chunk))
+        if precinct_column is not None:
+            precincts = list(map(interner.precinct_id, by_column[-1]))
+        for name, store, positions in owners:
+            ranks = []
+            for c in positions:
+                ids = list(map(store.id_of, by_column[c]))
+                if strict and UNKNOWN in ids:
+                    raise ValueError(f"unknown candidate {by_column[c][ids.index(UNKNOWN)]!r} in column {columns[c]!r}")
+                ranks.append(ids)
+            # EXHAUSTED is 0, so a row is blank for this contest when every id is
+            voted = [any(row) for row in zip(*ranks)]
+            for r in range(len(ranks)):
+                store.columns[r].extend(compress(ranks[r], voted))
+            if precinct_column is not None:
+                store.precincts.extend(compress(precincts, voted))
+            if undervotes is not None:
+                undervotes[name] += voted.count(False)
+    return stores
+
+def run_contest(name: str, store: BallotStore, grouped: bool, tie_break) -> tuple:
+    return name, tabulate(store, grouped, tie_break=tie_break)
+
+def tabulate_contests(stores: dict, workers: int = None, grouped: bool = False, tie_break = None) -> dict:
+    '''
+     Function that tabulates many contests concurrently
+
+        Parameters:
+        ------------
+        stores: dict -- contest name -> BallotStore, for example from load_contests
+        workers: int -- number of worker processes, one per CPU if None; 1 runs in this process
+        grouped: bool -- boolean that, if true, tabulates identical rankings as weighted groups
+        tie_break: RandomTieBreak -- tie-break policy used by every contest, the global random module if None
+
+        Returns:
+        --------
+        Dict of contest name -> RCVResult, in the order of stores
+        '''
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(stores)))
+    # largest first, so the biggest contest never starts last; blank ballots are not in the stores,
+    # so their length is the number of ballots cast in each contest
+    tasks = sorted(stores.items(), key=lambda item: len(item[1]), reverse=True)
+    tasks = [(name, store, grouped, tie_break) for name, store in tasks]
+    if workers == 1:
+        finished = dict(run_contest(*task) for task in tasks)
+    else:
+        with multiprocessing.get_context().Pool(workers) as pool:
+            finished = dict(pool.starmap(run_contest, tasks, chunksize=1))
+    return {name: finished[name] for name in stores}
+
+def render_contests_json(results: dict, undervotes: dict = None) -> str:
+    '''
+     Function that combines the results of several contests into one JSON report
+
+        Parameters:
+        ------------
+        results: dict -- contest name -> RCVResult
+        undervotes: dict -- contest name -> ballots that left it blank, as filled by load_contests; left out if None
+
+        Returns:
+        --------
+        JSON text with a "winners" summary, the "undervotes" if given and the full
+        rounds of every contest under "contests"
+        '''
+    report = {"winners": {name: result.winner for name, result in results.items()}}
+    if undervotes is not None:
+        report["undervotes"] = {name: undervotes.get(name, 0) for name in results}
+    report["contests"] = {name: json.loads(render_json(result)) for name, result in results.items()}
+    return json.dumps(report)
+
+def main():
+    parser = argparse.ArgumentParser(description="Tabulate every contest of a multi-contest CVR file")
+    parser.add_argument("path", help="CVR file (.csv)")
+    parser.add_argument("contests", help='JSON file mapping each contest to its "candidates" and "rank_columns"')
+    parser.add_argument("--precinct-column", help="header name of the precinct column")
+    parser.add_argument("--workers", type=int, help="worker processes, one per CPU by default")
+    args = parser.parse_args()
+    with open(args.contests) as file:
+        spec = json.load(file)
+    contests = [Contest(name, tuple(entry["candidates"]), tuple(entry["rank_columns"])) for name, entry in spec.items()]
+    undervotes = {}
+    stores = load_contests(args.path, contests, args.precinct_column, undervotes=undervotes)
+    print(render_contests_json(tabulate_contests(stores, args.workers), undervotes))
+
+def main_testing():
+    contests = [Contest("mayor", ("A", "B"), ("Mayor 1", "Mayor 2")),
+                Contest("council", ("X", "Y", "Z"), ("Council 1", "Council 2"))]
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "cvr.csv")
+        with open(path, "w", newline="", encoding="utf-8") as file:
+            file.write("precinct,Mayor 1,Mayor 2,Council 1,Council 2\nP1,A,B,,\nP2,B,,x,\nP1,A,,,\nP2,,,,\n")
+        undervotes = {}
+        stores = load_contests(path, contests, "precinct", undervotes=undervotes)
+    print("Test load_contests leaves blank ballots out: ")
+    print(f"Result: {len(stores['mayor'])} and {len(stores['council'])} ballots, undervotes {undervotes}")
+    print("Expected: 3 and 0 ballots, undervotes {'mayor': 1, 'council': 4}")
+    print(f"Result: {[stores['mayor'].precinct_names[p] for p in stores['mayor'].precincts]}")
+    print("Expected: ['P1', 'P2', 'P1']")
+    print("--------------------")
+    print("Test tabulate_contests with a contest nobody voted in: ")
+    print(f"Result: {json.loads(render_contests_json(tabulate_contests(stores, workers=1), undervotes))['winners']}")
+    print("Expected: {'mayor': 'A', 'council': None}")
+    print("--------------------")
+
+if __name__ == "__main__":
+    main()
+# main_testing()   # UNCOMMENT THIS TO RUN THE CHECKS INSTEAD OF THE COMMAND LINE
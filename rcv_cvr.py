@@ -0,0 +1,285 @@
+'''
+    Purpose: Stream cast vote record (CVR) exports from CSV or JSONL files
+    into the BallotStore that rcv.tabulate consumes, one chunk at a time,
+    so that memory stays bounded by the ballot columns (or the weighted
+    ballot groups) rather than by the size of the file
+'''
+import argparse
+import csv
+import json
+import os
+import sys
+import tempfile
+from array import array
+from collections import Counter
+from itertools import islice
+from rcv import BACKENDS, BallotStore, LotOrderTieBreak, UNKNOWN, group_ballots, render_console, render_csv, render_json, tabulate
+from rcv_file import write_ballot_file
+from rcv_metrics import TabulationMetrics
+from rcv_validate import BallotRules, Normalizer, ValidationReport
+
+CHUNK_SIZE = 65536
+
+def find_rank_columns(header: list) -> list:
+    '''
+     Function that picks the rank columns out of a CVR header
+
+        Parameters:
+        ------------
+        header: list -- column names of the CVR file
+
+        Returns:
+        --------
+        Column names that start with "rank" or "choice", in file order
+        '''
+    return [name for name in header if name.strip().lower().startswith(("rank", "choice"))]
+
+def read_csv_rankings(path: str, rank_columns: list = None, precinct_column: str = None):
+    '''
+     Generator that yields one ranking per CSV row
+
+        Parameters:
+        ------------
+        path: str -- CSV file with a header row
+        rank_columns: list -- header names of the rank columns, detected by find_rank_columns if None
+        precinct_column: str -- header name of the precinct column, appended to each tuple if given
+
+        Returns:
+        --------
+        Yields tuples of stripped names, one entry per rank column
+        '''
+    with open(path, newline="", encoding="utf-8") as file:
+        reader = csv.reader(file)
+        header = next(reader, None)
+        if header is None:
+            return
+        if rank_columns is None:
+            rank_columns = find_rank_columns(header)
+        if not rank_columns:
+            raise ValueError(f"{path}: no rank columns found in header")
+        positions = []
+        if precinct_column is not None:
+            rank_columns = list(rank_columns) + [precinct_column]
+        for name in rank_columns:
+            if name not in header:
+                raise ValueError(f"{path}: missing column {name!r}")
+            positions.append(header.index(name))
+        for row in reader:
+            if not row:
+                continue
+            if len(row) < len(header):
+                raise ValueError(f"{path}:{reader.line_num}: expected {len(header)} fields, found {len(row)}")
+            yield tuple(row[i].strip() for i in positions)
+
+def read_jsonl_rankings(path: str, num_ranks: int, ranks_key: str = "ranks", precinct_key: str = None):
+    '''
+     Generator that yields one ranking per JSON line
+
+        Parameters:
+        ------------
+        path: str -- file with one JSON object per line
+        num_ranks: int -- number of ranks each ballot is padded to
+        ranks_key: str -- key holding the list of names in rank order
+        precinct_key: str -- key holding the precinct, appended to each tuple if given
+
+        Returns:
+        --------
+        Yields tuples of stripped names of length num_ranks, padded with ""
+        '''
+    with open(path, encoding="utf-8") as file:
+        for line_number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                ranks = record[ranks_key]
+                precinct = () if precinct_key is None else (str(record[precinct_key]),)
+            except (ValueError, KeyError, TypeError) as error:
+                raise ValueError(f"{path}:{line_number}: bad CVR record ({error})") from None
+            if len(ranks) > num_ranks:
+                raise ValueError(f"{path}:{line_number}: {len(ranks)} ranks, at most {num_ranks} allowed")
+            yield tuple("" if name is None else str(name).strip() for name in ranks) + ("",)*(num_ranks - len(ranks)) + precinct
+
+def chunked(iterable, size: int = CHUNK_SIZE):
+    '''
+     Generator that batches an iterable into lists
+
+        Parameters:
+        ------------
+        iterable: iterable -- items to batch
+        size: int -- largest number of items per batch
+
+        Returns:
+        --------
+        Yields lists of at most size items
+        '''
+    iterator = iter(iterable)
+    chunk = list(islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, size))
+
+def append_chunk(store: BallotStore, chunk: list, strict: bool = False) -> None:
+    '''
+     Function that interns a chunk of rankings and appends it to the rank columns
+
+        Parameters:
+        ------------
+        store: BallotStore -- unweighted store to append to
+        chunk: list -- tuples of names, each store.num_ranks long, plus the precinct
+                       when the store tracks precincts
+        strict: bool -- boolean that, if true, raises on names not on the candidate list
+
+        Returns:
+        --------
+        None
+        '''
+    by_rank = list(zip(*chunk))
+    for r in range(store.num_ranks):
+        ids = list(map(store.id_of, by_rank[r]))
+        if strict and UNKNOWN in ids:
+            raise ValueError(f"unknown candidate {by_rank[r][ids.index(UNKNOWN)]!r}")
+        store.columns[r].extend(ids)
+    if store.precincts is not None:
+        store.precincts.extend(map(store.precinct_id, by_rank[-1]))
+
+def load_cvr(path: str, candidates: list, file_format: str = None, rank_columns: list = None,
+             num_ranks: int = None, grouped: bool = False, strict: bool = False,
+             chunk_size: int = CHUNK_SIZE, precinct_column: str = None, rules: BallotRules = None,
+             report: ValidationReport = None) -> BallotStore:
+    '''
+     Function that streams a CVR file into a BallotStore
+
+        Parameters:
+        ------------
+        path: str -- CVR file, ".csv" or ".jsonl"/".ndjson"
+        candidates: list -- names on the ballot, anything else is interned as UNKNOWN
+        file_format: str -- "csv" or "jsonl", taken from the file extension if None
+        rank_columns: list -- CSV rank column names, detected from the header if None
+        num_ranks: int -- ranks per ballot, required for JSONL files
+        grouped: bool -- boolean that, if true, counts identical rankings as they stream
+                         in and returns weighted ballot groups
+        strict: bool -- boolean that, if true, raises on names not on the candidate list
+        chunk_size: int -- ballots interned per batch
+        precinct_column: str -- CSV column or JSONL key naming each ballot's precinct, not tracked if None
+        rules: BallotRules -- normalize every ranking with these rules before interning, kept raw if None
+        report: ValidationReport -- report that receives the normalization problems, used with rules
+
+        Returns:
+        --------
+        BallotStore holding every ballot of the file
+        '''
+    if file_format is None:
+        file_format = "csv" if path.lower().endswith(".csv") else "jsonl"
+    if file_format == "csv":
+        rankings = read_csv_rankings(path, rank_columns, precinct_column)
+    elif file_format == "jsonl":
+        if num_ranks is None:
+            raise ValueError("num_ranks is required for JSONL files")
+        rankings = read_jsonl_rankings(path, num_ranks, precinct_key=precinct_column)
+    else:
+        raise ValueError(f"unknown CVR format: {file_format!r}")
+    store = None
+    groups = Counter()
+    normalizer = None if rules is None else Normalizer(candidates, rules, report)
+    for chunk in chunked(rankings, chunk_size):
+        if store is None:
+            store = BallotStore(candidates, len(chunk[0]) - (precinct_column is not None))
+            if precinct_column is not None:
+                store.precincts = array('I')
+        if normalizer is not None:
+            ranks = store.num_ranks
+            chunk = [normalizer.normalize_names(ranking[:ranks]) + ranking[ranks:] for ranking in chunk]
+        if grouped:
+            groups.update(chunk)
+        else:
+            append_chunk(store, chunk, strict)
+    if store is None:
+        return BallotStore(candidates, num_ranks or 0)
+    if grouped:
+        store.weights = array('Q')
+        rankings = list(groups)
+        for chunk in chunked(rankings, chunk_size):
+            append_chunk(store, chunk, strict)
+        store.weights.extend(groups[ranking] for ranking in rankings)
+        store = group_ballots(store)
+    return store
+
+def main():
+    parser = argparse.ArgumentParser(description="Tabulate a ranked-choice CVR file")
+    parser.add_argument("path", help="CVR file (.csv or .jsonl)")
+    parser.add_argument("candidates", nargs="+", help="candidate names")
+    parser.add_argument("--num-ranks", type=int, help="ranks per ballot (JSONL only)")
+    parser.add_argument("--grouped", action="store_true", help="tabulate weighted ballot groups")
+    parser.add_argument("--output", choices=["console", "json", "csv"], default="console", help="result format")
+    parser.add_argument("--save", help="also write the ballots to this binary ballot file (see rcv_file)")
+    parser.add_argument("--metrics", choices=["json", "prometheus"], help="print per-round timings and counters to stderr")
+    parser.add_argument("--backend", choices=BACKENDS, help="tabulation backend, NumPy for large files when installed by default")
+    parser.add_argument("--normalize", action="store_true", help="normalize the ballots first and print the validation report to stderr")
+    parser.add_argument("--exhaust-after-skipped", type=int, help="with --normalize, consecutive skipped ranks that end a ballot")
+    args = parser.parse_args()
+    rules = BallotRules(exhaust_after_skipped=args.exhaust_after_skipped) if args.normalize else None
+    report = ValidationReport()
+    store = load_cvr(args.path, args.candidates, num_ranks=args.num_ranks, grouped=args.grouped, rules=rules, report=report)
+    if args.normalize:
+        print(report.to_json(), file=sys.stderr)
+    if args.save:
+        write_ballot_file(store, args.save)
+    metrics = TabulationMetrics() if args.metrics else None
+    result = tabulate(store, metrics=metrics, backend=args.backend)
+    if args.output == "json":
+        print(render_json(result))
+    elif args.output == "csv":
+        print(render_csv(result), end="")
+    else:
+        render_console(result)
+    if args.metrics == "json":
+        print(metrics.to_json(), file=sys.stderr)
+    elif args.metrics == "prometheus":
+        print(metrics.to_prometheus(), end="", file=sys.stderr)
+
+def main_testing():
+    candidates = ["A", "B", "C"]
+    with tempfile.TemporaryDirectory() as folder:
+        csv_path = os.path.join(folder, "cvr.csv")
+        with open(csv_path, "w", newline="", encoding="utf-8") as file:
+            file.write("id,precinct,Rank 1,Rank 2,Rank 3\n1,P1,A,B,\n2,P2, B ,x,C\n3,P1,A,B,\n4,P2,D,A,\n5,P1,C,,\n\n")
+        jsonl_path = os.path.join(folder, "cvr.jsonl")
+        with open(jsonl_path, "w", encoding="utf-8") as file:
+            file.write('{"ranks": ["A", "B"], "precinct": "P1"}\n\n{"ranks": ["B", null, "C"], "precinct": "P2"}\n'
+                       '{"ranks": ["A", "B"], "precinct": "P1"}\n{"ranks": ["D", "A"], "precinct": "P2"}\n'
+                       '{"ranks": ["C"], "precinct": "P1"}\n')
+        print("Test load_cvr from CSV with a trailing blank line: ")
+        store = load_cvr(csv_path, candidates)
+        print(f"Result: {len(store)} ballots, {store.num_ranks} ranks, first choices {store.names_of(store.columns[0])}")
+        print("Expected: 5 ballots, 3 ranks, first choices ['A', 'B', 'A', '?', 'C']")
+        print("--------------------")
+        print("Test load_cvr from JSONL: ")
+        print(f"Result: {load_cvr(jsonl_path, candidates, num_ranks=3).fingerprint() == store.fingerprint()}")
+        print("Expected: True")
+        print("--------------------")
+        print("Test load_cvr grouped: ")
+        tie_break = LotOrderTieBreak(candidates)
+        grouped = load_cvr(csv_path, candidates, grouped=True)
+        same = tabulate(grouped, tie_break=tie_break).rounds == tabulate(store, tie_break=tie_break).rounds
+        print(f"Result: {len(grouped)} groups of {grouped.num_ballots} ballots, same rounds {same}")
+        print("Expected: 4 groups of 5 ballots, same rounds True")
+        print("--------------------")
+        print("Test load_cvr with a precinct column: ")
+        store = load_cvr(csv_path, candidates, precinct_column="precinct")
+        print(f"Result: {[store.precinct_names[p] for p in store.precincts]}")
+        print("Expected: ['P1', 'P2', 'P1', 'P2', 'P1']")
+        store = load_cvr(jsonl_path, candidates, num_ranks=3, grouped=True, precinct_column="precinct")
+        print(f"Result: {len(store)} groups, precincts {store.precinct_names}")
+        print("Expected: 4 groups, precincts ['P1', 'P2']")
+        print("--------------------")
+        print("Test load_cvr with rules: ")
+        report = ValidationReport()
+        store = load_cvr(csv_path, candidates, rules=BallotRules(unknown="exhaust"), report=report)
+        print(f"Result: second ballot {[store.name_of(column[1]) for column in store.columns]}, issues {dict(report.issues)}")
+        print("Expected: second ballot ['B', 'C', None], issues {'skipped_rank': 1, 'unknown_name': 1, 'exhausted_by_rule': 1}")
+        print("--------------------")
+
+if __name__ == "__main__":
+    main()
+# main_testing()   # UNCOMMENT THIS TO RUN THE CHECKS INSTEAD OF THE COMMAND LINE
@@ -0,0 +1,192 @@
+'''
+    Purpose: Save a BallotStore to a compact binary ballot file and map it
+    back in without parsing. The file is a fixed header, the candidate and
+    precinct tables as JSON, then the raw rank columns (and optional weights
+    and precinct columns), each aligned to 8 bytes. Opening a file only
+    reads the header; the columns are memoryviews over an mmap, so the
+    tabulation engine reads the page cache directly and concurrent
+    processes that open the same file share it
+
+    Example:
+        python rcv_file.py election.rcvb --output json
+'''
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from rcv import BallotStore, group_ballots, render_console, render_csv, render_json, tabulate
+
+MAGIC = b"RCVB"
+VERSION = 1
+# magic, version, column typecode, flags, number of ranks, table length, number of rows
+HEADER = struct.Struct("<4sHcBIIQ")
+HAS_WEIGHTS = 1
+HAS_PRECINCTS = 2
+BIG_ENDIAN = 4
+ALIGNMENT = 8
+
+def padding(offset: int) -> int:
+    return -offset % ALIGNMENT
+
+def write_ballot_file(store: BallotStore, path: str) -> None:
+    '''
+     Function that writes a BallotStore to a binary ballot file
+
+        Parameters:
+        ------------
+        store: BallotStore -- ballots to save, grouped or not
+        path: str -- file to create or overwrite
+
+        Returns:
+        --------
+        None
+        '''
+    flags = BIG_ENDIAN if sys.byteorder == "big" else 0
+    sections = [(store.typecode, column) for column in store.columns]
+    if store.weights is not None:
+        flags |= HAS_WEIGHTS
+        sections.append(('Q', store.weights))
+    if store.precincts is not None:
+        flags |= HAS_PRECINCTS
+        sections.append(('I', store.precincts))
+    table = json.dumps({"candidates": store.candidates, "precincts": store.precinct_names}).encode("utf-8")
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, store.typecode.encode("ascii"), flags, store.num_ranks, len(table), len(store)))
+        file.write(table)
+        file.write(bytes(padding(HEADER.size + len(table))))
+        for typecode, values in sections:
+            if len(values) != len(store):
+                raise ValueError("every column of the store must have one entry per ballot row")
+            # arrays and memoryviews alike, without an intermediate copy
+            data = memoryview(values).cast('B')
+            file.write(data)
+            file.write(bytes(padding(len(data))))
+
+def open_ballot_file(path: str) -> BallotStore:
+    '''
+     Function that maps a binary ballot file into a read-only BallotStore
+
+        Parameters:
+        ------------
+        path: str -- file written by write_ballot_file
+
+        Returns:
+        --------
+        BallotStore whose columns, weights and precincts are memoryviews over
+        the mapped file; the mapping is released once they are all dropped
+        '''
+    with open(path, "rb") as file:
+        mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(mapping) < HEADER.size:
+        raise ValueError(f"{path} is too short to be a ballot file")
+    magic, version, typecode, flags, num_ranks, table_size, rows = HEADER.unpack_from(mapping)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a ballot file")
+    if version != VERSION:
+        raise ValueError(f"{path} has ballot file version {version}, expected {VERSION}")
+    if bool(flags & BIG_ENDIAN) != (sys.byteorder == "big"):
+        raise ValueError(f"{path} was written on a machine with a different byte order")
+    table = json.loads(bytes(mapping[HEADER.size:HEADER.size + table_size]).decode("utf-8"))
+    store = BallotStore(table["candidates"], 0)
+    if typecode.decode("ascii") != store.typecode:
+        raise ValueError(f"{path} stores ids as {typecode!r}, expected {store.typecode!r}")
+    data = memoryview(mapping)
+    offset = HEADER.size + table_size
+    offset += padding(offset)
+
+    def section(typecode: str) -> memoryview:
+        nonlocal offset
+        size = rows*array(typecode).itemsize
+        if offset + size > len(mapping):
+            raise ValueError(f"{path} is truncated")
+        view = data[offset:offset + size].cast(typecode)
+        offset += size + padding(size)
+        return view
+
+    store.columns = [section(store.typecode) for r in range(num_ranks)]
+    if flags & HAS_WEIGHTS:
+        store.weights = section('Q')
+    if flags & HAS_PRECINCTS:
+        store.precincts = section('I')
+        for name in table["precincts"]:
+            store.precinct_id(name)
+    return store
+
+def slice_store(store: BallotStore, start: int, stop: int) -> BallotStore:
+    '''
+     Function that views rows start..stop of a store without copying
+
+        Parameters:
+        ------------
+        store: BallotStore -- store whose columns support slicing without a copy (memoryviews)
+        start: int -- first row
+        stop: int -- row after the last row
+
+        Returns:
+        --------
+        BallotStore over the same buffers
+        '''
+    shard = BallotStore(store.candidates, 0)
+    shard.columns = [column[start:stop] for column in store.columns]
+    if store.weights is not None:
+        shard.weights = store.weights[start:stop]
+    if store.precincts is not None:
+        shard.precincts = store.precincts[start:stop]
+        shard.precinct_names = store.precinct_names
+        shard.precinct_ids = store.precinct_ids
+    return shard
+
+def main():
+    parser = argparse.ArgumentParser(description="Tabulate a binary ballot file")
+    parser.add_argument("path", help="ballot file written by write_ballot_file")
+    parser.add_argument("--output", choices=["console", "json", "csv"], default="console", help="result format")
+    args = parser.parse_args()
+    result = tabulate(open_ballot_file(args.path))
+    if args.output == "json":
+        print(render_json(result))
+    elif args.output == "csv":
+        print(render_csv(result), end="")
+    else:
+        render_console(result)
+
+def main_testing():
+    store = BallotStore(["A", "B", "C"], 3)
+    store.precincts = array('I')
+    for ranking, precinct in [(["A", "B"], "P1"), (["C", None, "A"], "P2"), (["A", "B"], "P1"), (["zz", "C"], "P3")]:
+        store.add_ballot(ranking, precinct=precinct)
+    plain = BallotStore(store.candidates, 3)
+    plain.columns = store.columns
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "election.rcvb")
+        for label, original in [("unweighted", plain), ("weighted", group_ballots(plain)), ("precinct", store)]:
+            print(f"Test write_ballot_file and open_ballot_file, {label} store: ")
+            write_ballot_file(original, path)
+            mapped = open_ballot_file(path)
+            precincts = None if mapped.precincts is None else [mapped.precinct_names[p] for p in mapped.precincts]
+            print(f"Result: {mapped.fingerprint() == original.fingerprint()} {mapped.num_ballots} ballots, precincts {precincts}")
+            expected = ['P1', 'P2', 'P1', 'P3'] if label == "precinct" else None
+            print(f"Expected: True 4 ballots, precincts {expected}")
+            print("--------------------")
+            del mapped
+        with open(path, "rb") as file:
+            data = file.read()
+        for label, broken in [("bad magic", b"XXXX" + data[4:]), ("truncated", data[:-16])]:
+            print(f"Test open_ballot_file with a {label} file: ")
+            with open(path, "wb") as file:
+                file.write(broken)
+            try:
+                open_ballot_file(path)
+                print("Result: no error")
+            except ValueError as error:
+                print(f"Result: {str(error).replace(path, 'election.rcvb')}")
+            expected = "is not a ballot file" if label == "bad magic" else "is truncated"
+            print(f"Expected: election.rcvb {expected}")
+            print("--------------------")
+
+if __name__ == "__main__":
+    main()
+# main_testing()   # UNCOMMENT THIS TO RUN THE CHECKS INSTEAD OF THE COMMAND LINE
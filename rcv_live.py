@@ -0,0 +1,180 @@
+'''
+    Purpose: Publish unofficial ranked-choice results while precincts are
+    still reporting. A LiveTabulation only keeps first-choice tallies and
+    the weight of each distinct ranking, both updated as batches arrive,
+    so a refresh runs the round logic on the aggregated groups and costs
+    the same however many ballots are already loaded
+'''
+from array import array
+from collections import Counter
+from rcv import EXHAUSTED, BallotStore, LotOrderTieBreak, build_ballot_store, tabulate
+
+class LiveTabulation:
+    '''
+     Class that accumulates ballot batches and re-tabulates on demand
+
+        Attributes:
+        ------------
+        candidates: list -- candidate names
+        num_ranks: int -- ranks per ballot
+        groups: Counter -- ranking id tuple -> number of ballots
+        first_choices: list -- first-choice votes indexed by id
+        precincts: dict -- precinct name -> ballots it reported
+        num_ballots: int -- ballots loaded so far
+        '''
+    def __init__(self, candidates: list, num_ranks: int) -> None:
+        self.table = BallotStore(candidates, num_ranks)
+        self.candidates = self.table.candidates
+        self.num_ranks = num_ranks
+        self.groups = Counter()
+        self.first_choices = [0]*self.table.num_ids
+        self.precincts = {}
+        self.num_ballots = 0
+        self.grouped = None
+
+    def check_precinct(self, precinct: str) -> None:
+        if precinct is not None and precinct in self.precincts:
+            raise ValueError(f"precinct {precinct!r} has already reported")
+
+    def add_group(self, ranking: tuple, weight: int) -> None:
+        self.groups[ranking] += weight
+        self.first_choices[ranking[0] if ranking else EXHAUSTED] += weight
+        self.num_ballots += weight
+        self.grouped = None
+
+    def add_batch(self, rankings, precinct: str = None) -> int:
+        '''
+         Function that adds a batch of ballots given as lists of names
+
+            Parameters:
+            ------------
+            rankings: iterable -- ballots as sequences of names in rank order
+            precinct: str -- precinct reporting the batch; a precinct can only report once
+
+            Returns:
+            --------
+            Number of ballots added
+            '''
+        self.check_precinct(precinct)
+        batch = Counter(tuple(ranking) for ranking in rankings)
+        encoded = []
+        for ranking, weight in batch.items():
+            if len(ranking) > self.num_ranks:
+                raise ValueError(f"ballot has {len(ranking)} ranks, at most {self.num_ranks} allowed")
+            ids = tuple(map(self.table.id_of, ranking)) + (EXHAUSTED,)*(self.num_ranks - len(ranking))
+            encoded.append((ids, weight))
+        # only touch the totals once the whole batch is known to be valid
+        added = 0
+        for ids, weight in encoded:
+            self.add_group(ids, weight)
+            added += weight
+        if precinct is not None:
+            self.precincts[precinct] = added
+        return added
+
+    def add_store(self, store: BallotStore, precinct: str = None) -> int:
+        '''
+         Function that adds a batch already loaded into a BallotStore, for example by rcv_cvr.load_cvr
+
+            Parameters:
+            ------------
+            store: BallotStore -- ballots with the same candidates and rank depth
+            precinct: str -- precinct reporting the batch; a precinct can only report once
+
+            Returns:
+            --------
+            Number of ballots added
+            '''
+        if store.candidates != self.candidates or store.num_ranks != self.num_ranks:
+            raise ValueError("the batch has a different candidate list or rank depth")
+        self.check_precinct(precinct)
+        rankings = zip(*store.columns)
+        if store.weights is None:
+            batch = Counter(rankings)
+        else:
+            batch = Counter()
+            for ranking, weight in zip(rankings, store.weights):
+                batch[ranking] += weight
+        for ranking, weight in batch.items():
+            self.add_group(ranking, weight)
+        if precinct is not None:
+            self.precincts[precinct] = store.num_ballots
+        return store.num_ballots
+
+    def first_choice_tallies(self) -> dict:
+        return {name: self.first_choices[self.table.ids[name]] for name in self.candidates}
+
+    def ballots(self) -> BallotStore:
+        '''
+         Function that turns the accumulated groups into a weighted BallotStore
+
+            Returns:
+            --------
+            BallotStore with one row per distinct ranking, rebuilt only after new batches
+            '''
+        if self.grouped is None:
+            grouped = BallotStore(self.candidates, self.num_ranks)
+            rankings = list(self.groups)
+            for r in range(self.num_ranks):
+                grouped.columns[r] = array(grouped.typecode, [ranking[r] for ranking in rankings])
+            grouped.weights = array('Q', [self.groups[ranking] for ranking in rankings])
+            self.grouped = grouped
+        return self.grouped
+
+    def results(self, tie_break = None, batch_elimination: bool = False):
+        '''
+         Function that tabulates everything reported so far
+
+            Parameters:
+            ------------
+            tie_break: RandomTieBreak -- tie-break policy, the global random module if None
+            batch_elimination: bool -- boolean that, if true, drops mathematically eliminated candidates together
+
+            Returns:
+            --------
+            RCVResult of the unofficial count
+            '''
+        return tabulate(self.ballots(), tie_break=tie_break, batch_elimination=batch_elimination)
+
+def main():
+    names = ["A", "B", "C"]
+    first = [["A", "B"], ["B", "C", "A"], ["C"], ["A", "C", "B"]]
+    second = [["B", "A", "C"], ["C", "B", "x"], ["C", "A", "x"], ["B", "x", "x"]]
+    third = [["C", "B"], ["zz", "A"], ["B"]]
+    live = LiveTabulation(names, 3)
+    live.add_batch(first, "P1")
+    live.add_store(build_ballot_store(names, *zip(*second)), "P2")
+    live.add_batch(third)
+    every = first + second + third
+    store = BallotStore(names, 3)
+    for ranking in every:
+        store.add_ballot(ranking)
+    print("Test LiveTabulation.results against tabulate: ")
+    result = live.results(LotOrderTieBreak(names))
+    print(f"Result: {result.rounds == tabulate(store, tie_break=LotOrderTieBreak(names)).rounds} "
+          f"{result.num_ballots} ballots, winner {result.winner}")
+    print(f"Expected: True 11 ballots, winner {tabulate(store, tie_break=LotOrderTieBreak(names)).winner}")
+    print("--------------------")
+    print("Test LiveTabulation.first_choice_tallies: ")
+    print(f"Result: {live.first_choice_tallies()}")
+    print("Expected: {'A': 2, 'B': 4, 'C': 4}")
+    print("--------------------")
+    print("Test a precinct reporting twice: ")
+    try:
+        live.add_batch([["A"]], "P2")
+        print("Result: no error")
+    except ValueError as error:
+        print(f"Result: {error}, {live.num_ballots} ballots")
+    print("Expected: precinct 'P2' has already reported, 11 ballots")
+    print("--------------------")
+    print("Test a batch with a ballot longer than num_ranks: ")
+    try:
+        live.add_batch([["A"], ["B", "C", "A", "A"]], "P3")
+        print("Result: no error")
+    except ValueError as error:
+        print(f"Result: {error}, {live.num_ballots} ballots, {live.first_choice_tallies()}, {sorted(live.precincts)}")
+    print("Expected: ballot has 4 ranks, at most 3 allowed, 11 ballots, {'A': 2, 'B': 4, 'C': 4}, ['P1', 'P2']")
+    print("--------------------")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+'''
+    Purpose: Collect per-round timings and counters from rcv.tabulate and
+    export them as JSON or in the Prometheus text format, so that scaling
+    regressions in production tallies show up without a profiler. Pass a
+    TabulationMetrics as the metrics argument of tabulate or simple_rcv;
+    without one the engine never reads the clock
+
+    Example:
+        metrics = TabulationMetrics(labels={"contest": "mayor"})
+        result = tabulate(store, metrics=metrics)
+        print(metrics.to_prometheus())
+'''
+import json
+from rcv import LotOrderTieBreak, build_ballot_store, tabulate
+
+PHASES = ("count", "select", "transfer")
+
+class TabulationMetrics:
+    '''
+     Class that records where a tabulation spends its time, round by round
+
+        Attributes:
+        ------------
+        rounds: list -- one dict per round with the seconds spent in each phase
+                        ("count_seconds", "select_seconds", "transfer_seconds") and the
+                        counters "rows_touched", "votes_transferred" and "votes_exhausted"
+        labels: dict -- extra Prometheus labels, for example the contest name
+        callback: function -- called with each round's dict as soon as it is recorded, None for none
+        '''
+    def __init__(self, labels: dict = None, callback = None) -> None:
+        self.rounds = []
+        self.labels = dict(labels or {})
+        self.callback = callback
+
+    def record_round(self, current, count_seconds: float, select_seconds: float, transfer_seconds: float,
+                     rows_touched: int) -> None:
+        '''
+         Function called by rcv.tabulate at the end of every round
+
+            Parameters:
+            ------------
+            current: RoundResult -- the round that just finished
+            count_seconds: float -- time spent reading the tallies and checking for a majority
+            select_seconds: float -- time spent choosing the candidates to eliminate
+            transfer_seconds: float -- time spent moving the eliminated candidates' ballots
+            rows_touched: int -- ballot rows the tally moved, 0 for tallies that do not count them
+
+            Returns:
+            --------
+            None
+            '''
+        record = {"round": current.round, "count_seconds": count_seconds, "select_seconds": select_seconds,
+                  "transfer_seconds": transfer_seconds, "rows_touched": rows_touched,
+                  "votes_transferred": sum(current.transfers.values()),
+                  "votes_exhausted": current.exhausted_transfers,
+                  "eliminated": list(current.eliminated)}
+        self.rounds.append(record)
+        if self.callback is not None:
+            self.callback(record)
+
+    def totals(self) -> dict:
+        '''
+         Function that adds up the timings and counters of every round
+
+            Returns:
+            --------
+            Dict with "rounds", "seconds", one "<phase>_seconds" entry per phase and
+            the "rows_touched", "votes_transferred" and "votes_exhausted" totals
+            '''
+        totals = {"rounds": len(self.rounds)}
+        for key in [phase + "_seconds" for phase in PHASES] + ["rows_touched", "votes_transferred", "votes_exhausted"]:
+            totals[key] = sum(record[key] for record in self.rounds)
+        totals["seconds"] = sum(totals[phase + "_seconds"] for phase in PHASES)
+        return totals
+
+    def to_json(self) -> str:
+        return json.dumps({"labels": self.labels, "totals": self.totals(), "rounds": self.rounds})
+
+    def to_prometheus(self) -> str:
+        '''
+         Function that exports the metrics in the Prometheus text exposition format
+
+            Returns:
+            --------
+            Text with one HELP/TYPE block per metric; per-round phase timings carry
+            "round" and "phase" labels on top of the collector's labels
+            '''
+        def labels(**extra) -> str:
+            merged = dict(self.labels, **extra)
+            if not merged:
+                return ""
+            pairs = []
+            for key, value in merged.items():
+                value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+                pairs.append(f'{key}="{value}"')
+            return "{" + ",".join(pairs) + "}"
+
+        totals = self.totals()
+        lines = ["# HELP rcv_round_phase_seconds Wall time spent in a tabulation phase of one round",
+                 "# TYPE rcv_round_phase_seconds gauge"]
+        for record in self.rounds:
+            for phase in PHASES:
+                lines.append(f"rcv_round_phase_seconds{labels(round=record['round'], phase=phase)} {record[phase + '_seconds']!r}")
+        for name, key, kind, text in [("rcv_rounds", "rounds", "gauge", "Rounds of the tabulation"),
+                                      ("rcv_tabulation_seconds", "seconds", "gauge", "Wall time of the whole tabulation"),
+                                      ("rcv_rows_touched_total", "rows_touched", "counter", "Ballot rows moved by eliminations"),
+                                      ("rcv_votes_transferred_total", "votes_transferred", "counter", "Votes transferred to continuing candidates"),
+                                      ("rcv_votes_exhausted_total", "votes_exhausted", "counter", "Votes exhausted by eliminations")]:
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name}{labels()} {totals[key]!r}")
+        return "\n".join(lines) + "\n"
+
+def main():
+    names = ["A", "B", "C"]
+    store = build_ballot_store(names, ["A", "A", "B", "B", "C", "C", "A"], ["x", "B", "A", "x", "B", "x", "x"])
+    metrics = TabulationMetrics(labels={"contest": 'mayor "at large"'})
+    tabulate(store, tie_break=LotOrderTieBreak(names), metrics=metrics)
+    print("Test TabulationMetrics.totals: ")
+    totals = metrics.totals()
+    print(f"Result: {totals['rounds']} rounds, {totals['votes_transferred']} transferred, {totals['votes_exhausted']} exhausted")
+    print("Expected: 2 rounds, 1 transferred, 1 exhausted")
+    print(f"Result: {[record['eliminated'] for record in metrics.rounds]}")
+    print("Expected: [['B'], []]")
+    print("--------------------")
+    print("Test TabulationMetrics.to_prometheus: ")
+    lines = metrics.to_prometheus().splitlines()
+    print(f"Result: {lines[:2]}")
+    print("Expected: ['# HELP rcv_round_phase_seconds Wall time spent in a tabulation phase of one round', "
+          "'# TYPE rcv_round_phase_seconds gauge']")
+    print(f"Result: {lines[2].rsplit(' ', 1)[0]}")
+    print(r'Expected: rcv_round_phase_seconds{contest="mayor \"at large\"",round="1",phase="count"}')
+    for line in lines:
+        if line.startswith(("rcv_rounds{", "rcv_votes_exhausted_total{")):
+            print(f"Result: {line}")
+    print(r'Expected: rcv_rounds{contest="mayor \"at large\""} 2')
+    print(r'Expected: rcv_votes_exhausted_total{contest="mayor \"at large\""} 1')
+    print("--------------------")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+'''
+    Purpose: Estimate how likely each candidate is to win when ties are
+    broken by lot. Many independently seeded draws run on a process pool
+    over one shared, read-only ballot set. Because a round only depends on
+    which candidates are already out, each worker memoizes the decision
+    of every elimination state it reaches (the winner, the candidate to
+    eliminate, or the candidates tied for it); a draw is then just a walk
+    through that memo, and only tied states consume random numbers
+
+    Example:
+        python rcv_montecarlo.py election.rcvb --draws 100000
+'''
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import random
+from collections import Counter
+from rcv import BallotStore, find_batch_elimination, find_index_of_min, group_ballots, simple_majority_vote
+from rcv_file import open_ballot_file
+from rcv_scenarios import ScenarioEngine
+
+Z_95 = 1.959963984540054
+WORKER = {}
+
+def wilson_interval(successes: int, trials: int, z: float = Z_95) -> tuple:
+    '''
+     Function that gives the Wilson score confidence interval of a proportion
+
+        Parameters:
+        ------------
+        successes: int -- draws with the outcome
+        trials: int -- total draws
+        z: float -- normal quantile of the confidence level, 95% by default
+
+        Returns:
+        --------
+        (low, high) bounds of the probability
+        '''
+    if trials == 0:
+        return (0.0, 1.0)
+    p = successes/trials
+    denominator = 1 + z*z/trials
+    center = (p + z*z/(2*trials))/denominator
+    margin = z*math.sqrt(p*(1 - p)/trials + z*z/(4*trials*trials))/denominator
+    return (max(0.0, center - margin), min(1.0, center + margin))
+
+class PathSimulator:
+    '''
+     Class that runs tie-break draws through memoized elimination states
+
+        Attributes:
+        ------------
+        store: BallotStore -- ballots of the election
+        engine: ScenarioEngine -- cache of the vote counts of every elimination state
+        batch_elimination: bool -- boolean that, if true, drops mathematically eliminated candidates together
+        decisions: dict -- frozenset of eliminated ids -> ("winner" or "eliminate", options)
+        '''
+    def __init__(self, store: BallotStore, batch_elimination: bool = False) -> None:
+        self.store = store
+        self.engine = ScenarioEngine(store)
+        self.batch_elimination = batch_elimination
+        self.decisions = {}
+
+    def decide(self, eliminated: frozenset) -> tuple:
+        '''
+         Function that finds what happens in the round reached once eliminated are out
+
+            The majority and minimum rules are the ones rcv.tabulate uses; ties
+            are recorded instead of drawn.
+
+            Parameters:
+            ------------
+            eliminated: frozenset -- ids of the candidates that are out
+
+            Returns:
+            --------
+            ("winner", names that may win, [None] if nobody has a vote) or ("eliminate", tuples of ids that may be
+            eliminated together); more than one option means a tie decided by lot
+            '''
+        if eliminated in self.decisions:
+            return self.decisions[eliminated]
+        counts = self.engine.counts_for(None, eliminated)
+        continuing = [x for x in self.store.candidate_ids() if x not in eliminated]
+        vote_count = [counts[x] for x in continuing]
+        tied = []
+
+        def record(options: list) -> int:
+            tied.extend(options)
+            return options[0]
+
+        # nobody is elected without votes, as in rcv.tabulate
+        winner = simple_majority_vote(vote_count, record) if any(vote_count) else None
+        if not any(vote_count):
+            decision = ("winner", [None])
+        elif winner != None:
+            options = tied or [winner]
+            decision = ("winner", [self.store.name_of(continuing[i]) for i in options])
+        else:
+            batch = find_batch_elimination(vote_count) if self.batch_elimination else []
+            if batch:
+                decision = ("eliminate", [tuple(continuing[i] for i in batch)])
+            else:
+                lowest = find_index_of_min(vote_count, record)
+                decision = ("eliminate", [(continuing[i],) for i in tied or [lowest]])
+        self.decisions[eliminated] = decision
+        return decision
+
+    def draw(self, seed: str, start: frozenset = frozenset()) -> tuple:
+        '''
+         Function that runs one tabulation, drawing lots at every tie
+
+            Parameters:
+            ------------
+            seed: str -- seed of this draw's generator, only created once a tie is reached
+            start: frozenset -- ids of withdrawn candidates
+
+            Returns:
+            --------
+            (winner name, tuple of eliminated names in order)
+            '''
+        eliminated = start
+        order = []
+        rng = None
+        while True:
+            kind, options = self.decide(eliminated)
+            if len(options) == 1:
+                pick = options[0]
+            else:
+                if rng is None:
+                    rng = random.Random(seed)
+                pick = options[rng.randrange(len(options))]
+            if kind == "winner":
+                return pick, tuple(order)
+            order.extend(self.store.names_of(pick))
+            eliminated = eliminated | set(pick)
+
+def simulate_draws(simulator: PathSimulator, seed, first: int, stop: int, start: frozenset) -> tuple:
+    '''
+     Function that runs draws first..stop-1, each seeded from (seed, draw number)
+
+        Parameters:
+        ------------
+        simulator: PathSimulator -- memo of the elimination states
+        seed: int -- base seed of the draws
+        first: int -- number of the first draw
+        stop: int -- number after the last draw
+        start: frozenset -- ids of withdrawn candidates
+
+        Returns:
+        --------
+        (Counter of winners, Counter of elimination orders)
+        '''
+    winners = Counter()
+    orders = Counter()
+    for n in range(first, stop):
+        winner, order = simulator.draw(f"{seed}:{n}", start)
+        winners[winner] += 1
+        orders[order] += 1
+    return winners, orders
+
+def init_worker(source, batch_elimination: bool) -> None:
+    store = open_ballot_file(source) if isinstance(source, str) else source
+    WORKER["simulator"] = PathSimulator(store, batch_elimination)
+
+def run_worker(seed, first: int, stop: int, start: frozenset) -> tuple:
+    return simulate_draws(WORKER["simulator"], seed, first, stop, start)
+
+def estimate_win_probabilities(store, draws: int = 10000, seed = 0, workers: int = None, exclude: list = (),
+                               batch_elimination: bool = False, top_orders: int = 10) -> dict:
+    '''
+     Function that estimates the outcome distribution of tie-broken tabulations
+
+        Draw n uses random.Random(f"{seed}:{n}"), so the report does not
+        depend on the number of workers.
+
+        Parameters:
+        ------------
+        store: BallotStore -- ballots of the election, or the path of a binary ballot file
+                              that every worker maps instead of receiving a copy
+        draws: int -- number of tabulations to simulate
+        seed: int -- base seed of the draws
+        workers: int -- number of worker processes, one per CPU if None; 1 runs in this process
+        exclude: list -- names of withdrawn candidates
+        batch_elimination: bool -- boolean that, if true, drops mathematically eliminated candidates together
+        top_orders: int -- number of most frequent elimination orders to report
+
+        Returns:
+        --------
+        Dict with the number of "draws", the "winners" and the most common elimination
+        "orders", each entry holding its "count", "probability" and 95% "interval"
+        '''
+    source = store
+    if isinstance(store, str):
+        store = open_ballot_file(store)
+    elif store.weights is None:
+        # workers only need one row per distinct ranking
+        source = store = group_ballots(store, keep_precincts=False)
+    for name in exclude:
+        if name not in store.ids:
+            raise ValueError(f"cannot exclude unknown candidate {name!r}")
+    start = frozenset(store.ids[name] for name in exclude)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, draws))
+    if workers == 1:
+        winners, orders = simulate_draws(PathSimulator(store, batch_elimination), seed, 0, draws, start)
+    else:
+        chunks = [(seed, draws*w//workers, draws*(w + 1)//workers, start) for w in range(workers)]
+        with multiprocessing.get_context().Pool(workers, init_worker, (source, batch_elimination)) as pool:
+            parts = pool.starmap(run_worker, chunks)
+        winners = Counter()
+        orders = Counter()
+        for part_winners, part_orders in parts:
+            winners.update(part_winners)
+            orders.update(part_orders)
+
+    def summary(count: int) -> dict:
+        return {"count": count, "probability": count/draws if draws else 0.0,
+                "interval": wilson_interval(count, draws)}
+
+    return {"draws": draws,
+            "winners": {name: summary(count) for name, count in winners.most_common()},
+            "orders": [dict(order=list(order), **summary(count)) for order, count in orders.most_common(top_orders)]}
+
+def main():
+    parser = argparse.ArgumentParser(description="Estimate win probabilities when ties are broken by lot")
+    parser.add_argument("path", help="binary ballot file (see rcv_file)")
+    parser.add_argument("--draws", type=int, default=10000)
+    parser.add_argument("--seed", default="0")
+    parser.add_argument("--workers", type=int, help="worker processes, one per CPU by default")
+    parser.add_argument("--batch-elimination", action="store_true")
+    args = parser.parse_args()
+    report = estimate_win_probabilities(args.path, args.draws, args.seed, args.workers,
+                                        batch_elimination=args.batch_elimination)
+    print(json.dumps(report, indent=2))
+
+def main_testing():
+    store = BallotStore(["A", "B", "C"], 1)
+    for name in ["A", "A", "B", "B", "C", "C"]:
+        store.add_ballot([name])
+    print("Test estimate_win_probabilities with a three-way tie: ")
+    report = estimate_win_probabilities(store, 30000, seed=1, workers=1)
+    inside = all(low < 1/3 < high for low, high in (report["winners"][name]["interval"] for name in "ABC"))
+    print(f"Result: {sorted(report['winners'])}, 1/3 inside every interval {inside}")
+    print("Expected: ['A', 'B', 'C'], 1/3 inside every interval True")
+    print("--------------------")
+    print("Test estimate_win_probabilities with workers=1 and workers=2: ")
+    print(f"Result: {estimate_win_probabilities(store, 30000, seed=1, workers=2) == report}")
+    print("Expected: True")
+    print("--------------------")
+    print("Test estimate_win_probabilities with a tie for last place only: ")
+    store.add_ballot(["A"])
+    report = estimate_win_probabilities(store, 1000, seed=1, workers=1)
+    print(f"Result: {report['winners']['A']['count']} of {report['draws']}, "
+          f"orders {sorted(entry['order'] for entry in report['orders'])}")
+    print("Expected: 1000 of 1000, orders [['B'], ['C']]")
+    print("--------------------")
+
+if __name__ == "__main__":
+    main()
+# main_testing()   # UNCOMMENT THIS TO RUN THE CHECKS INSTEAD OF THE COMMAND LINE
@@ -0,0 +1,271 @@
+'''
+    Purpose: Tabulate very large elections on several cores. The ballot
+    columns are copied once into shared memory and split into contiguous
+    shards; every worker process keeps an IncrementalTally over its shard
+    and reports per-round transfers, while the coordinator merges them and
+    makes every elimination decision with the same rules as rcv.tabulate.
+    Ballots opened from a binary ballot file are not copied at all: every
+    worker maps the same file and reads its shard from the page cache
+'''
+import multiprocessing
+import os
+import random
+import tempfile
+from array import array
+from multiprocessing import shared_memory
+from rcv import BallotStore, IncrementalTally, LotOrderTieBreak, group_ballots, tabulate
+from rcv_file import open_ballot_file, slice_store, write_ballot_file
+
+def share_array(values) -> shared_memory.SharedMemory:
+    '''
+     Function that copies an array into a new shared memory block
+
+        Parameters:
+        ------------
+        values: array -- column to share
+
+        Returns:
+        --------
+        SharedMemory block holding the raw bytes of values
+        '''
+    data = memoryview(values).cast('B')
+    block = shared_memory.SharedMemory(create=True, size=max(1, len(data)))
+    block.buf[:len(data)] = data
+    return block
+
+def attach_array(block: shared_memory.SharedMemory, typecode: str, start: int, stop: int) -> memoryview:
+    '''
+     Function that views rows start..stop of a shared column without copying
+
+        Parameters:
+        ------------
+        block: SharedMemory -- block created by share_array
+        typecode: str -- array typecode of the column
+        start: int -- first row of the shard
+        stop: int -- row after the last row of the shard
+
+        Returns:
+        --------
+        memoryview over the shard's rows
+        '''
+    itemsize = array(typecode).itemsize
+    return block.buf[start*itemsize:stop*itemsize].cast(typecode)
+
+def shard_worker(connection, candidates: list, typecode: str, column_names: list, weights_name: str, start: int, stop: int,
+                 path: str = None) -> None:
+    '''
+     Function run by each worker process: tallies one shard and answers the coordinator
+
+        Parameters:
+        ------------
+        connection: Connection -- pipe to the coordinator
+        candidates: list -- candidate names of the election
+        typecode: str -- array typecode of the rank columns
+        column_names: list -- shared memory names of the rank columns
+        weights_name: str -- shared memory name of the weights column, None if unweighted
+        start: int -- first ballot row of the shard
+        stop: int -- row after the last ballot row of the shard
+        path: str -- binary ballot file to map instead of the shared memory blocks, None to use the blocks
+
+        Returns:
+        --------
+        None
+        '''
+    blocks = [shared_memory.SharedMemory(name=name) for name in column_names]
+    if weights_name is not None:
+        blocks.append(shared_memory.SharedMemory(name=weights_name))
+    if path is not None:
+        shard = slice_store(open_ballot_file(path), start, stop)
+    else:
+        shard = BallotStore(candidates, 0)
+        shard.columns = [attach_array(block, typecode, start, stop) for block in blocks[:len(column_names)]]
+        if weights_name is not None:
+            shard.weights = attach_array(blocks[-1], 'Q', start, stop)
+    try:
+        tally = IncrementalTally(shard)
+        connection.send(tally.counts)
+        message = connection.recv()
+        while message is not None:
+            if message[0] == "eliminate":
+                connection.send(tally.eliminate(message[1]))
+            message = connection.recv()
+    except Exception as error:
+        connection.send(error)
+    finally:
+        tally = None
+        shard = None
+        for block in blocks:
+            block.close()
+        connection.close()
+
+class ShardedTally:
+    '''
+     Class that spreads an IncrementalTally over a pool of worker processes
+
+        It offers the same counts / votes_for / eliminate members as
+        IncrementalTally, so rcv.tabulate drives it unchanged and produces the
+        same eliminations and winner as the serial engine.
+
+        Attributes:
+        ------------
+        store: BallotStore -- ballots being tabulated
+        path: str -- binary ballot file the workers map, None when the columns go through shared memory
+        counts: list -- merged votes indexed by id
+        '''
+    def __init__(self, store: BallotStore, workers: int = None, path: str = None) -> None:
+        self.store = store
+        self.path = path
+        if workers is None:
+            workers = os.cpu_count() or 1
+        workers = max(1, min(workers, len(store)))
+        self.blocks = [] if path is not None else [share_array(column) for column in store.columns]
+        weights_name = None
+        if store.weights is not None and path is None:
+            self.blocks.append(share_array(store.weights))
+            weights_name = self.blocks[-1].name
+        column_names = [block.name for block in self.blocks[:store.num_ranks]]
+        context = multiprocessing.get_context()
+        self.connections = []
+        self.processes = []
+        for w in range(workers):
+            start = len(store)*w//workers
+            stop = len(store)*(w + 1)//workers
+            parent, child = context.Pipe()
+            process = context.Process(target=shard_worker, args=(child, store.candidates, store.typecode, column_names, weights_name, start, stop, path), daemon=True)
+            process.start()
+            child.close()
+            self.connections.append(parent)
+            self.processes.append(process)
+        self.counts = self.merge(self.receive_all())
+
+    def receive_all(self) -> list:
+        replies = [connection.recv() for connection in self.connections]
+        for reply in replies:
+            if isinstance(reply, Exception):
+                self.close()
+                raise reply
+        return replies
+
+    def merge(self, tallies: list) -> list:
+        '''
+         Function that adds up per-shard lists indexed by id
+
+            Parameters:
+            ------------
+            tallies: list -- one list per shard
+
+            Returns:
+            --------
+            Element-wise total of the lists
+            '''
+        merged = [0]*self.store.num_ids
+        for tally in tallies:
+            for x in range(len(merged)):
+                merged[x] += tally[x]
+        return merged
+
+    def votes_for(self, candidate_ids: list) -> list:
+        return [self.counts[x] for x in candidate_ids]
+
+    def eliminate(self, candidate_id: int) -> list:
+        '''
+         Function that eliminates a candidate on every shard and merges the transfers
+
+            Parameters:
+            ------------
+            candidate_id: int -- id of the eliminated candidate
+
+            Returns:
+            --------
+            List indexed by id with the votes each id received from the transfer
+            '''
+        for connection in self.connections:
+            connection.send(("eliminate", candidate_id))
+        transfers = self.merge(self.receive_all())
+        for x in range(len(transfers)):
+            self.counts[x] += transfers[x]
+        self.counts[candidate_id] = 0
+        return transfers
+
+    def close(self) -> None:
+        '''
+         Function that stops the workers and frees the shared memory
+
+            Returns:
+            --------
+            None
+            '''
+        for connection in self.connections:
+            try:
+                connection.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+            connection.close()
+        for process in self.processes:
+            process.join()
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.connections = []
+        self.processes = []
+        self.blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+def tabulate_parallel(store, workers: int = None, grouped: bool = False, tie_break = None):
+    '''
+     Function that runs rcv.tabulate with the ballots sharded across worker processes
+
+        Parameters:
+        ------------
+        store: BallotStore -- ballots to tabulate, or the path of a binary ballot file
+                              that every worker maps instead of receiving a copy
+        workers: int -- number of worker processes, one per CPU if None
+        grouped: bool -- boolean that, if true, groups identical rankings before sharding
+        tie_break: RandomTieBreak -- tie-break policy, the global random module if None
+
+        Returns:
+        --------
+        RCVResult of the tabulation
+        '''
+    path = None
+    if isinstance(store, str):
+        path = store
+        store = open_ballot_file(path)
+    if grouped and store.weights is None:
+        # grouping builds new columns, so they have to go through shared memory
+        path = None
+        store = group_ballots(store, keep_precincts=False)
+    with ShardedTally(store, workers, path) as tally:
+        return tabulate(store, tally=tally, tie_break=tie_break)
+
+def main():
+    rng = random.Random(7)
+    names = ["A", "B", "C", "D", "E"]
+    store = BallotStore(names, 3)
+    for b in range(600):
+        store.add_ballot([rng.choice(names + [None, "zz"]) for r in range(3)])
+    tie_break = LotOrderTieBreak(["E", "D", "C", "B", "A"])
+    serial = tabulate(store, tie_break=tie_break)
+    print("Test tabulate_parallel against tabulate: ")
+    print(f"Result: {tabulate_parallel(store, workers=2, tie_break=tie_break) == serial} in {len(serial.rounds)} rounds")
+    print(f"Expected: True in {len(serial.rounds)} rounds")
+    print("--------------------")
+    print("Test tabulate_parallel grouped against tabulate: ")
+    print(f"Result: {tabulate_parallel(store, workers=2, grouped=True, tie_break=tie_break).rounds == serial.rounds}")
+    print("Expected: True")
+    print("--------------------")
+    print("Test tabulate_parallel over a ballot file against tabulate: ")
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "election.rcvb")
+        write_ballot_file(store, path)
+        print(f"Result: {tabulate_parallel(path, workers=2, tie_break=tie_break) == serial}")
+    print("Expected: True")
+    print("--------------------")
+
+if __name__ == "__main__":
+    main()
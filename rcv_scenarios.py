@@ -0,0 +1,249 @@
+'''
+    Purpose: Answer batches of "what if" questions about one election:
+    what if a candidate withdraws, what if only some precincts are counted,
+    what if ties are drawn differently. Ballots are grouped once per
+    precinct subset, and the vote counts of every set of eliminated
+    candidates are cached, so scenarios that pass through the same
+    elimination states share their work instead of recounting
+'''
+from array import array
+from dataclasses import dataclass
+from rcv import EXHAUSTED, BallotStore, LotOrderTieBreak, RandomTieBreak, group_ballots, tabulate
+
+@dataclass(frozen=True)
+class Scenario:
+    '''
+     Class that describes one variant of the election
+
+        Attributes:
+        ------------
+        name: str -- label of the scenario in the results
+        exclude: tuple -- names of candidates treated as withdrawn
+        precincts: frozenset -- precinct names to count, None for every ballot
+        tie_break: RandomTieBreak -- tie-break policy, the global random module if None
+        '''
+    name: str
+    exclude: tuple = ()
+    precincts: frozenset = None
+    tie_break: RandomTieBreak = None
+
+def precinct_subset(store: BallotStore, precincts: frozenset) -> BallotStore:
+    '''
+     Function that keeps only the ballots cast in some precincts
+
+        Parameters:
+        ------------
+        store: BallotStore -- ballots with precincts tracked
+        precincts: frozenset -- names of the precincts to keep; ValueError if one is not in the store
+
+        Returns:
+        --------
+        BallotStore with the matching rows, weights and precincts
+        '''
+    if store.precincts is None:
+        raise ValueError("the ballots do not record precincts")
+    wanted = set()
+    for name in precincts:
+        if name not in store.precinct_ids:
+            raise ValueError(f"unknown precinct {name!r}")
+        wanted.add(store.precinct_ids[name])
+    rows = [b for b in range(len(store)) if store.precincts[b] in wanted]
+    subset = BallotStore(store.candidates, store.num_ranks)
+    for r in range(store.num_ranks):
+        column = store.columns[r]
+        subset.columns[r] = array(store.typecode, [column[b] for b in rows])
+    if store.weights is not None:
+        subset.weights = array('Q', [store.weights[b] for b in rows])
+    subset.precincts = array('I', [store.precincts[b] for b in rows])
+    subset.precinct_names = list(store.precinct_names)
+    subset.precinct_ids = dict(store.precinct_ids)
+    return subset
+
+class CachedTally:
+    '''
+     Class that answers vote counts from a ScenarioEngine cache
+
+        It offers the counts / votes_for / eliminate members of
+        IncrementalTally, so rcv.tabulate drives it unchanged. Its state is
+        just the set of candidates that are out, because a ballot's current
+        choice only depends on which candidates have been eliminated, not
+        on the order they went out in.
+
+        Attributes:
+        ------------
+        engine: ScenarioEngine -- owner of the cache
+        precincts: frozenset -- precinct subset being counted
+        eliminated: frozenset -- ids of the candidates that are out
+        counts: list -- votes indexed by id for the current state
+        '''
+    def __init__(self, engine, precincts: frozenset, eliminated: frozenset) -> None:
+        self.engine = engine
+        self.precincts = precincts
+        self.eliminated = eliminated
+        self.counts = engine.counts_for(precincts, eliminated)
+
+    def votes_for(self, candidate_ids: list) -> list:
+        return [self.counts[x] for x in candidate_ids]
+
+    def eliminate(self, candidate_id: int) -> list:
+        before = self.counts
+        self.eliminated = self.eliminated | {candidate_id}
+        self.counts = self.engine.counts_for(self.precincts, self.eliminated)
+        transfers = [self.counts[x] - before[x] for x in range(len(before))]
+        transfers[candidate_id] = 0
+        return transfers
+
+class ScenarioEngine:
+    '''
+     Class that evaluates many scenarios over one shared ballot set
+
+        Attributes:
+        ------------
+        store: BallotStore -- ballots of the election, never modified
+        stats: dict -- number of tallies computed and served from the cache
+        '''
+    def __init__(self, store: BallotStore) -> None:
+        self.store = store
+        self.rows = {}
+        self.tallies = {}
+        self.results = {}
+        self.stats = {"computed": 0, "cached": 0}
+
+    def rows_for(self, precincts: frozenset) -> list:
+        '''
+         Function that groups the ballots of a precinct subset once and keeps them
+
+            Parameters:
+            ------------
+            precincts: frozenset -- precinct names to count, None for every ballot
+
+            Returns:
+            --------
+            List of (ranking tuple, weight) pairs, one per distinct ranking
+            '''
+        if precincts not in self.rows:
+            ballots = self.store if precincts is None else precinct_subset(self.store, precincts)
+            grouped = group_ballots(ballots, keep_precincts=False)
+            self.rows[precincts] = list(zip(zip(*grouped.columns), grouped.weights))
+        return self.rows[precincts]
+
+    def counts_for(self, precincts: frozenset, eliminated: frozenset) -> list:
+        '''
+         Function that counts votes once the candidates in eliminated are out
+
+            Parameters:
+            ------------
+            precincts: frozenset -- precinct names to count, None for every ballot
+            eliminated: frozenset -- ids of the candidates that are out
+
+            Returns:
+            --------
+            List of votes indexed by id (shared with the cache, do not modify)
+            '''
+        key = (precincts, eliminated)
+        if key in self.tallies:
+            self.stats["cached"] += 1
+            return self.tallies[key]
+        self.stats["computed"] += 1
+        out = bytearray(self.store.num_ids)
+        for x in eliminated:
+            out[x] = 1
+        counts = [0]*self.store.num_ids
+        for ranking, weight in self.rows_for(precincts):
+            current = EXHAUSTED
+            for choice in ranking:
+                if not out[choice]:
+                    current = choice
+                    break
+            counts[current] += weight
+        self.tallies[key] = counts
+        return counts
+
+    def run(self, scenario: Scenario):
+        '''
+         Function that tabulates one scenario, reusing cached rounds
+
+            Parameters:
+            ------------
+            scenario: Scenario -- variant to evaluate
+
+            Returns:
+            --------
+            RCVResult of the scenario
+            '''
+        tie_break = scenario.tie_break or RandomTieBreak()
+        key = (scenario.precincts, frozenset(scenario.exclude), tie_break.key)
+        if tie_break.key is not None and key in self.results:
+            return self.results[key]
+        for name in scenario.exclude:
+            if name not in self.store.ids:
+                raise ValueError(f"cannot exclude unknown candidate {name!r}")
+        excluded = frozenset(self.store.ids[name] for name in scenario.exclude)
+        tally = CachedTally(self, scenario.precincts, excluded)
+        result = tabulate(self.store, tally=tally, tie_break=tie_break, exclude=scenario.exclude)
+        result.num_ballots = sum(tally.counts)
+        if tie_break.key is not None:
+            self.results[key] = result
+        return result
+
+def run_scenarios(store: BallotStore, scenarios: list) -> dict:
+    '''
+     Function that evaluates a batch of scenarios over one ballot set
+
+        Parameters:
+        ------------
+        store: BallotStore -- ballots of the election
+        scenarios: list -- Scenario objects to evaluate
+
+        Returns:
+        --------
+        Dict of scenario name -> RCVResult
+        '''
+    engine = ScenarioEngine(store)
+    return {scenario.name: engine.run(scenario) for scenario in scenarios}
+
+def main():
+    names = ["A", "B", "C", "D"]
+    store = BallotStore(names, 3)
+    store.precincts = array('I')
+    for ranking, precinct in [(["A", "B", "C"], "P1"), (["B", "C", None], "P1"), (["C", "B", "A"], "P2"),
+                              (["D", "C", "B"], "P2"), (["A", "D", None], "P3"), (["C", "A", "B"], "P3"),
+                              (["B", "A", "D"], "P1"), (["D", "A", None], "P2"), (["A", None, None], "P3")]:
+        store.add_ballot(ranking, precinct=precinct)
+    tie_break = LotOrderTieBreak(names)
+    engine = ScenarioEngine(store)
+    print("Test ScenarioEngine.run with every ballot: ")
+    result = engine.run(Scenario("all", tie_break=tie_break))
+    print(f"Result: {result == tabulate(store, tie_break=tie_break)}")
+    print("Expected: True")
+    print("--------------------")
+    print("Test ScenarioEngine.run with a withdrawn candidate: ")
+    result = engine.run(Scenario("no C", exclude=("C",), tie_break=tie_break))
+    print(f"Result: {result == tabulate(store, tie_break=tie_break, exclude=['C'])}")
+    print("Expected: True")
+    print("--------------------")
+    print("Test ScenarioEngine.run with a precinct subset: ")
+    result = engine.run(Scenario("P1 and P2", precincts=frozenset({"P1", "P2"}), tie_break=tie_break))
+    subset = precinct_subset(store, frozenset({"P1", "P2"}))
+    print(f"Result: {result == tabulate(subset, tie_break=tie_break)} with {result.num_ballots} ballots")
+    print("Expected: True with 6 ballots")
+    print("--------------------")
+    print("Test ScenarioEngine cache hits: ")
+    computed = engine.stats["computed"]
+    again = engine.run(Scenario("all again", tie_break=tie_break))
+    withdrawn = engine.run(Scenario("no C again", exclude=("C",), tie_break=LotOrderTieBreak(names)))
+    print(f"Result: {again is engine.run(Scenario('all', tie_break=tie_break))} {withdrawn.winner} "
+          f"{engine.stats['computed'] - computed} new tallies")
+    print(f"Expected: True {tabulate(store, tie_break=tie_break, exclude=['C']).winner} 0 new tallies")
+    print("--------------------")
+    print("Test ScenarioEngine.run with an unknown precinct: ")
+    try:
+        engine.run(Scenario("typo", precincts=frozenset({"P9"}), tie_break=tie_break))
+        print("Result: no error")
+    except ValueError as error:
+        print(f"Result: {error}")
+    print("Expected: unknown precinct 'P9'")
+    print("--------------------")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+'''
+    Purpose: Validate and normalize ballots once, before the count. Every
+    raw ranking becomes a clean sequence of distinct candidates on the
+    ballot, with the rank-by-rank rules (skipped ranks, overvotes, "x"
+    placeholders, names not on the ballot, repeated candidates) applied
+    up front and every problem recorded in a ValidationReport. The round
+    loop then only ever sees clean ballots. Each distinct raw ranking is
+    normalized once, however many ballots share it
+'''
+import json
+from array import array
+from collections import Counter
+from dataclasses import dataclass
+from itertools import islice
+from rcv import BLANK_MARKS, EXHAUSTED, UNKNOWN, BallotStore
+
+OVERVOTE = -1           # classification of a rank marked for more than one candidate
+EXAMPLE_LIMIT = 10      # ballot numbers kept per issue in a ValidationReport
+CHUNK_SIZE = 65536
+
+@dataclass(frozen=True)
+class BallotRules:
+    '''
+     Class that configures how raw rankings are normalized
+
+        Attributes:
+        ------------
+        duplicates: str -- "skip" ignores later rankings of a candidate already ranked, "exhaust" ends the ballot there
+        overvote: str -- "exhaust" ends the ballot at an overvoted rank, "skip" treats the rank as skipped
+        unknown: str -- names not on the candidate list: "skip", "exhaust" or "error" to raise ValueError
+        exhaust_after_skipped: int -- consecutive skipped ranks that end the ballot, None to always skip them
+        overvote_marks: tuple -- entries that mark an overvote, as written by the CVR export
+        overvote_separator: str -- separator of several names written in one rank, None if unused
+        '''
+    duplicates: str = "skip"
+    overvote: str = "exhaust"
+    unknown: str = "skip"
+    exhaust_after_skipped: int = None
+    overvote_marks: tuple = ("overvote",)
+    overvote_separator: str = "|"
+
+    def __post_init__(self) -> None:
+        for name, value, allowed in [("duplicates", self.duplicates, ("skip", "exhaust")),
+                                     ("overvote", self.overvote, ("skip", "exhaust")),
+                                     ("unknown", self.unknown, ("skip", "exhaust", "error"))]:
+            if value not in allowed:
+                raise ValueError(f"{name} must be one of {allowed}, not {value!r}")
+        if self.exhaust_after_skipped is not None and self.exhaust_after_skipped < 1:
+            raise ValueError("exhaust_after_skipped must be at least 1")
+
+class ValidationReport:
+    '''
+     Class that records the problems found while normalizing ballots
+
+        Attributes:
+        ------------
+        num_ballots: int -- ballots normalized
+        num_changed: int -- ballots whose ranking was changed by the rules
+        issues: Counter -- issue name -> number of ballots with it: "skipped_rank",
+                           "overvote", "unknown_name", "duplicate", "exhausted_by_rule"
+        examples: dict -- issue name -> first EXAMPLE_LIMIT ballot numbers (0-based) with it
+        '''
+    def __init__(self) -> None:
+        self.num_ballots = 0
+        self.num_changed = 0
+        self.issues = Counter()
+        self.examples = {}
+
+    def record(self, issues: tuple, changed: bool, count: int = 1) -> None:
+        '''
+         Function that adds count ballots with the same normalization outcome
+
+            Parameters:
+            ------------
+            issues: tuple -- distinct issue names found on the ballots
+            changed: bool -- boolean that is true if the rules changed the ranking
+            count: int -- number of ballots, numbered from num_ballots on
+
+            Returns:
+            --------
+            None
+            '''
+        for issue in issues:
+            self.issues[issue] += count
+            examples = self.examples.setdefault(issue, [])
+            for ballot in range(self.num_ballots, self.num_ballots + min(count, EXAMPLE_LIMIT - len(examples))):
+                examples.append(ballot)
+        if changed:
+            self.num_changed += count
+        self.num_ballots += count
+
+    def to_json(self) -> str:
+        return json.dumps({"num_ballots": self.num_ballots, "num_changed": self.num_changed,
+                           "issues": dict(self.issues), "examples": self.examples})
+
+class Normalizer:
+    '''
+     Class that normalizes rankings against one candidate list, caching every distinct ranking
+
+        Attributes:
+        ------------
+        store: BallotStore -- candidate table the ids come from
+        rules: BallotRules -- normalization rules
+        report: ValidationReport -- problems found so far
+        '''
+    def __init__(self, candidates: list, rules: BallotRules = None, report: ValidationReport = None) -> None:
+        self.store = BallotStore(candidates, 0)
+        self.rules = rules or BallotRules()
+        self.report = report if report is not None else ValidationReport()
+        self.cache = {}
+        self.names = [""]*self.store.num_ids
+        for name in self.store.candidates:
+            self.names[self.store.ids[name]] = name
+
+    def classify(self, mark) -> int:
+        '''
+         Function that interns one rank entry, telling overvotes apart
+
+            Parameters:
+            ------------
+            mark: str -- raw entry, or an id when normalizing a BallotStore
+
+            Returns:
+            --------
+            Candidate id, EXHAUSTED for a skipped rank, UNKNOWN or OVERVOTE
+            '''
+        if isinstance(mark, int):
+            return mark
+        if mark in BLANK_MARKS:
+            return EXHAUSTED
+        if mark in self.store.ids:
+            return self.store.ids[mark]
+        if mark in self.rules.overvote_marks or (self.rules.overvote_separator and self.rules.overvote_separator in mark):
+            return OVERVOTE
+        return UNKNOWN
+
+    def apply_rules(self, ranking: tuple) -> tuple:
+        '''
+         Function that normalizes one raw ranking
+
+            Parameters:
+            ------------
+            ranking: tuple -- raw entries in rank order, names or ids
+
+            Returns:
+            --------
+            (ids of the distinct valid choices padded with EXHAUSTED to the ranking's length,
+            tuple of the issues found, boolean that is true if the ranking was changed)
+            '''
+        rules = self.rules
+        clean = []
+        issues = []
+        skipped = 0
+        exhausted = False
+        for mark in ranking:
+            choice = self.classify(mark)
+            if choice == EXHAUSTED:
+                skipped += 1
+                continue
+            if skipped:
+                issues.append("skipped_rank")
+                if rules.exhaust_after_skipped is not None and skipped >= rules.exhaust_after_skipped:
+                    exhausted = True
+                    break
+            if choice == OVERVOTE:
+                issues.append("overvote")
+                if rules.overvote == "exhaust":
+                    exhausted = True
+                    break
+                skipped += 1
+                continue
+            skipped = 0
+            if choice == UNKNOWN:
+                if rules.unknown == "error":
+                    raise ValueError(f"unknown candidate {mark!r}")
+                issues.append("unknown_name")
+                if rules.unknown == "exhaust":
+                    exhausted = True
+                    break
+            elif choice in clean:
+                issues.append("duplicate")
+                if rules.duplicates == "exhaust":
+                    exhausted = True
+                    break
+            else:
+                clean.append(choice)
+        if exhausted:
+            issues.append("exhausted_by_rule")
+        padded = tuple(clean) + (EXHAUSTED,)*(len(ranking) - len(clean))
+        changed = padded != tuple(map(self.classify, ranking))
+        return padded, tuple(dict.fromkeys(issues)), changed
+
+    def normalize(self, ranking: tuple, count: int = 1) -> tuple:
+        '''
+         Function that normalizes a ranking cast on count ballots and records it in the report
+
+            Parameters:
+            ------------
+            ranking: tuple -- raw entries in rank order, names or ids
+            count: int -- number of ballots with this ranking
+
+            Returns:
+            --------
+            Tuple of clean ids, padded with EXHAUSTED
+            '''
+        if ranking not in self.cache:
+            self.cache[ranking] = self.apply_rules(ranking)
+        clean, issues, changed = self.cache[ranking]
+        self.report.record(issues, changed, count)
+        return clean
+
+    def normalize_names(self, ranking: tuple) -> tuple:
+        return tuple(self.names[x] for x in self.normalize(ranking))
+
+def normalize_rankings(candidates: list, rankings, rules: BallotRules = None, report: ValidationReport = None,
+                       num_ranks: int = None) -> BallotStore:
+    '''
+     Function that normalizes raw name rankings into a clean BallotStore
+
+        Parameters:
+        ------------
+        candidates: list -- names on the ballot
+        rankings: iterable -- raw rankings as sequences of names, for example zip(first_choice, second_choice)
+        rules: BallotRules -- normalization rules, the defaults if None
+        report: ValidationReport -- report to add the problems to, a new one is used if None
+        num_ranks: int -- ranks per ballot, taken from the first ranking if None
+
+        Returns:
+        --------
+        BallotStore whose rank columns only hold distinct candidate ids followed by EXHAUSTED
+        '''
+    normalizer = Normalizer(candidates, rules, report)
+    rankings = iter(rankings)
+    store = None if num_ranks is None else BallotStore(candidates, num_ranks)
+    chunk = list(islice(rankings, CHUNK_SIZE))
+    while chunk:
+        if store is None:
+            store = BallotStore(candidates, len(chunk[0]))
+        clean = [normalizer.normalize(tuple(ranking)) for ranking in chunk]
+        for ranking in clean:
+            if len(ranking) != store.num_ranks:
+                raise ValueError(f"ballot has {len(ranking)} ranks, expected {store.num_ranks}")
+        for r in range(store.num_ranks):
+            store.columns[r].extend([ranking[r] for ranking in clean])
+        chunk = list(islice(rankings, CHUNK_SIZE))
+    return store if store is not None else BallotStore(candidates, 0)
+
+def normalize_store(store: BallotStore, rules: BallotRules = None, report: ValidationReport = None) -> BallotStore:
+    '''
+     Function that normalizes the rankings of an existing BallotStore
+
+        Weights and precincts are kept row for row. Overvotes cannot be
+        detected here, since interning already turned them into UNKNOWN.
+
+        Parameters:
+        ------------
+        store: BallotStore -- ballots to normalize, grouped or not
+        rules: BallotRules -- normalization rules, the defaults if None
+        report: ValidationReport -- report to add the problems to, a new one is used if None
+
+        Returns:
+        --------
+        New BallotStore whose rank columns only hold distinct candidate ids followed by EXHAUSTED
+        '''
+    normalizer = Normalizer(store.candidates, rules, report)
+    clean = BallotStore(store.candidates, store.num_ranks)
+    rows = zip(*store.columns)
+    weights = iter(store.weights) if store.weights is not None else None
+    chunk = list(islice(rows, CHUNK_SIZE))
+    while chunk:
+        normalized = [normalizer.normalize(ranking, 1 if weights is None else next(weights)) for ranking in chunk]
+        for r in range(store.num_ranks):
+            clean.columns[r].extend([ranking[r] for ranking in normalized])
+        chunk = list(islice(rows, CHUNK_SIZE))
+    if store.weights is not None:
+        clean.weights = array('Q', store.weights)
+    if store.precincts is not None:
+        clean.precincts = array('I', store.precincts)
+        clean.precinct_names = list(store.precinct_names)
+        clean.precinct_ids = dict(store.precinct_ids)
+    return clean
+
+def main():
+    candidates = ["A", "B", "C"]
+    print("Test normalize_names with a skipped rank: ")
+    normalizer = Normalizer(candidates)
+    print("Expected: ('A', 'B', '')")
+    print(f"Result: {normalizer.normalize_names(('A', 'x', 'B'))}")
+    print("Expected issues: ['skipped_rank']")
+    print(f"Result: {list(normalizer.report.issues)}")
+    print("--------------------")
+    print("Test exhaust_after_skipped=2: ")
+    normalizer = Normalizer(candidates, BallotRules(exhaust_after_skipped=2))
+    print("Expected: ('A', '', '', '')")
+    print(f"Result: {normalizer.normalize_names(('A', 'x', 'x', 'B'))}")
+    print("Expected issues: ['skipped_rank', 'exhausted_by_rule']")
+    print(f"Result: {list(normalizer.report.issues)}")
+    print("--------------------")
+    print("Test overvote with overvote=\"skip\": ")
+    normalizer = Normalizer(candidates, BallotRules(overvote="skip"))
+    print("Expected: ('A', 'C', '')")
+    print(f"Result: {normalizer.normalize_names(('A', 'B|C', 'C'))}")
+    print("--------------------")
+    print("Test overvote with overvote=\"exhaust\": ")
+    normalizer = Normalizer(candidates, BallotRules(overvote="exhaust"))
+    print("Expected: ('A', '', '')")
+    print(f"Result: {normalizer.normalize_names(('A', 'overvote', 'C'))}")
+    print("Expected issues: ['overvote', 'exhausted_by_rule']")
+    print(f"Result: {list(normalizer.report.issues)}")
+    print("--------------------")
+    print("Test duplicate with duplicates=\"exhaust\": ")
+    normalizer = Normalizer(candidates, BallotRules(duplicates="exhaust"))
+    print("Expected: ('A', '', '')")
+    print(f"Result: {normalizer.normalize_names(('A', 'A', 'B'))}")
+    print("--------------------")
+    print("Test normalize_store matches normalize_rankings: ")
+    rankings = [("A", "x", "B"), ("B", "B", "C"), ("D", "C", "A"), ("x", "x", "x"), ("A", "x", "B")]
+    rules = BallotRules(unknown="exhaust")
+    by_rankings = ValidationReport()
+    clean = normalize_rankings(candidates, rankings, rules, by_rankings)
+    raw = BallotStore(candidates, 3)
+    for ranking in rankings:
+        raw.add_ballot(ranking)
+    by_store = ValidationReport()
+    print("Expected: True True")
+    print(f"Result: {normalize_store(raw, rules, by_store).columns == clean.columns} {by_store.to_json() == by_rankings.to_json()}")
+    print("--------------------")
+
+if __name__ == "__main__":
+    main()